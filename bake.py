@@ -0,0 +1,112 @@
+"""렌더링한 프레임을 화면에 바로 쓸 수 있는 형태로 굽는 오프라인 단계
+
+video_generator.py가 만든 render/model_N/frame_NNNN.png 를 읽어
+밝기 보정을 여러 프레임 단위의 NumPy 연산으로 한 번에 적용하고,
+원래 크기의 render/model_N.hfa와 화면 크기별(LOD_SIZES) render/model_N.<크기>.hfa 아카이브로 저장한다.
+ImageRotationUI는 창에 맞는 크기의 아카이브를 골라 쓰므로 실행 중에 크기 조정을 하지 않고,
+맞는 크기가 없으면 PNG 대신 같은 밝기의 model_N.hfa를 쓴다.
+
+밝기 배율은 render_manifest.json에 PNG가 보정되지 않았다고 기록되어 있을 때만 적용한다
+(model_manifest.frames_brightened). 이 단계 이전에 렌더링한 프레임은 이미 보정되어 있다.
+
+사용법:
+    python bake.py render/model_1 render/model_2
+    python bake.py render/model_3 --sizes 300 450 --brightness 1.2
+"""
+from PyQt5.QtCore import QSize, Qt
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import frame_archive
+import model_manifest
+
+# 상자(정사각형) 한 변의 길이. 450은 800x600 창 기준 크기 (ui.BASE_BOX)
+LOD_SIZES = (225, 300, 450, 600, 900)
+BATCH = 16
+
+
+def fit_size(width, height, box):
+    """Qt.KeepAspectRatio와 같은 규칙으로 box 안에 맞춘 크기 (실행 중 크기 비교와 정확히 일치해야 함)"""
+    size = QSize(width, height).scaled(box, box, Qt.KeepAspectRatio)
+    return size.width(), size.height()
+
+
+def read_frame(path) -> np.ndarray:
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"cannot decode {path}")
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2RGBA)
+    if image.shape[2] == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGBA)
+    return cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+
+
+def bake_model(model_path, sizes=LOD_SIZES, brightness=None, compress=False) -> dict:
+    """원래 크기 아카이브와 크기별 아카이브를 만들고 {box_size: path}를 돌려준다 (원래 크기는 None).
+
+    brightness: None이면 PNG가 보정되지 않았을 때만 model_manifest.BRIGHTNESS를 적용한다."""
+    manifest = model_manifest.ModelManifest(model_path, use_archive=False)
+    count = manifest.frame_count
+    first = read_frame(manifest.frame_paths[0])
+    height, width = first.shape[:2]
+    table = model_manifest.brightness_table(manifest.brightness if brightness is None else brightness)
+
+    # None: 어느 크기에도 맞지 않는 창과 PNG 대신 쓰는 원래 크기
+    targets = {None: (width, height), **{box: fit_size(width, height, box) for box in sizes}}
+    writers = {box: frame_archive.ArchiveWriter(frame_archive.archive_path(model_path, box), count, compress)
+               for box in targets}
+    try:
+        batch = np.empty((BATCH, height, width, 4), dtype=np.uint8)
+        for start in range(0, count, BATCH):
+            n = min(BATCH, count - start)
+            for i in range(n):
+                frame = first if start + i == 0 else read_frame(manifest.frame_paths[start + i])
+                if frame.shape != batch.shape[1:]:
+                    raise ValueError(f"all frames must have the same size ({manifest.frame_paths[start + i]})")
+                batch[i] = frame
+            model_manifest.brighten(batch[:n], table)
+
+            for box, (w, h) in targets.items():
+                interpolation = cv2.INTER_AREA if w <= width else cv2.INTER_LINEAR
+                for frame in batch[:n]:
+                    resized = frame if (w, h) == (width, height) else cv2.resize(frame, (w, h), interpolation=interpolation)
+                    writers[box].add_rgba(np.ascontiguousarray(resized), w, h)
+
+        for writer in writers.values():
+            writer.close()
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+
+    # 목록에 없는 예전 크기는 지운다
+    for box, path in frame_archive.find_lods(model_path).items():
+        if box not in targets:
+            os.remove(path)
+    return {box: writer.path for box, writer in writers.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="bake rendered frames into display-ready size levels")
+    parser.add_argument("models", nargs="+", help="model folders (e.g. ./render/model_1)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=LOD_SIZES, help="box sizes to generate")
+    parser.add_argument("--brightness", type=float, default=None,
+                        help="brightness factor (default: as recorded in render_manifest.json, 1.0: unchanged)")
+    parser.add_argument("--compress", action="store_true", help="zlib level 1 per frame (smaller, not zero-copy)")
+    args = parser.parse_args(argv)
+
+    for model_path in args.models:
+        start = time.perf_counter()
+        paths = bake_model(model_path, args.sizes, args.brightness, args.compress)
+        total = sum(os.path.getsize(i) for i in paths.values()) / 2**20
+        print(f"{model_path}: {len(paths) - 1} levels + full size, {total:.1f} MB in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""카메라와 화면 없이 한 틱 전체의 지연 시간을 측정하는 벤치마크
+
+녹화한 영상, 프레임 폴더 또는 합성 프레임을 차례로 넣어
+프레임 읽기 -> 손 인식 -> 제스처/각도 계산 -> 인덱스 갱신 -> 오프스크린 렌더링
+단계별 시간을 재고 p50/p95/p99와 처리량을 출력한다.
+
+--worker는 main.WithCameraUI를 오프스크린으로 그대로 띄워 실제 틱(update_images)을 UI의 틱 간격대로 돌린다.
+프레임은 CaptureThread와 FrameRing을 거쳐 InferenceWorker(별도 프로세스, 공유 메모리)로 가고,
+모델 프레임은 ModelLoader.poll과 step_images를 거친다. 단계 이름은 같고 값은 앱의 Telemetry에서 읽는다.
+    capture: 링 버퍼의 프레임을 작업 프로세스에 넘기는 시간 (축소 + 공유 메모리 복사)
+    recognition: 작업 프로세스 안의 손 인식 시간
+    gesture: 결과를 받은 틱의 제스처/회전 계산
+    index: 틱의 나머지 (loader.poll, 움직임 확인, 인덱스 갱신)
+    render: 새 프레임을 넘긴 틱의 오프스크린 렌더링
+    capture_to_result: 캡처부터 결과를 받기까지 (이 모드에만 있음)
+
+사용법:
+    python benchmark.py --source synthetic --frames 300
+    python benchmark.py --source recording.mp4 --json pi4.json
+    python benchmark.py --source ./frames --compare x86.json
+    python benchmark.py --worker --source recording.mp4 --frames 200 --json pi4-worker.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import cv2
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QImage
+from PyQt5.QtCore import Qt
+
+import camera_load
+import hand
+import hand_tracking
+import hand_worker
+import rotation
+import ui
+
+STAGES = ("capture", "recognition", "gesture", "index", "render", "total")
+# --worker: 작업 프로세스 준비와 모델 프레임 로딩을 기다리는 최대 시간 (초)
+WARMUP_TIMEOUT = 60.0
+
+
+def camera_frames(camera, count):
+    """camera_load 백엔드를 실제 캡처처럼 재사용 버퍼에 읽는다."""
+    dst = np.empty(camera.shape, dtype=np.uint8)
+    try:
+        n = 0
+        while count is None or n < count:
+            frame = camera.read(dst)
+            if frame is None:
+                break
+            dst = frame
+            yield frame
+            n += 1
+    finally:
+        camera.close()
+
+
+def directory_frames(path, count):
+    names = sorted(i for i in os.listdir(path) if i.lower().endswith((".png", ".jpg", ".jpeg")))
+    for name in names[:count]:
+        frame = cv2.imread(os.path.join(path, name), cv2.IMREAD_COLOR)
+        yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def open_source(source, count):
+    if source == "synthetic":
+        return camera_frames(camera_load.SyntheticBackend(), count or 300)
+    if os.path.isdir(source):
+        return directory_frames(source, count)
+    # 기다리지 않고 최대 속도로 디코딩한다 (읽기 시간만 재도록)
+    return camera_frames(camera_load.VideoFileBackend(source, loop=False, realtime=False), count)
+
+
+def summarize(samples):
+    a = np.asarray(samples, dtype=np.float64) * 1000.0
+    if len(a) == 0:
+        return None
+    p50, p95, p99 = np.percentile(a, (50, 95, 99))
+    return {
+        "count": int(len(a)),
+        "mean_ms": float(a.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(a.max()),
+    }
+
+
+def load_render_frames(model_path, max_size):
+    """렌더링 단계에서 쓸 모델 프레임을 캐시 한도까지 올린다 (측정에서 디코딩 제외)
+
+    한도보다 큰 모델은 일부 프레임이 None으로 남고, 그 틱에는 이전 프레임을 다시 그린다.
+    """
+    import frame_cache
+    import model_loader
+
+    loader = model_loader.ModelLoader(frame_cache.FrameCache(), max_size)
+    loader.request(model_path)
+    loader.wait_ready(model_path)
+    frames = loader.frames(model_path)
+    while True:
+        loader.poll(model_path, 0)
+        if not loader.jobs:
+            break
+        time.sleep(0.005)
+    loader.shutdown()
+    return frames
+
+
+def run(args):
+    app = QApplication.instance() or QApplication([])
+
+    canvas = ui.HologramCanvas()
+    canvas.resize(*args.window)
+    pixmaps = load_render_frames(args.model, canvas.box_size)
+    canvas.set_frame_size(pixmaps[0].width(), pixmaps[0].height())
+    target = QImage(canvas.size(), QImage.Format_ARGB32_Premultiplied)
+
+    model = None
+    if not args.no_inference:
+        import mediapipe as mp
+        config = dict(hand_worker.DEFAULT_HANDS_CONFIG, max_num_hands=args.max_num_hands)
+        model = mp.solutions.hands.Hands(**config)
+    tracker = hand.RoiTracker() if args.tracking else None
+    gate = hand.MotionGate() if args.gate else None
+    empty = np.zeros((0, 21, 3), dtype=np.float32)
+
+    times = {stage: [] for stage in STAGES}
+    index = 0
+    controller = rotation.RotationController(len(pixmaps))
+    control = hand_tracking.HandControl(controller)
+    recog = hand.HandRecog.fromArrays(empty, empty, [])
+    frames = open_source(args.source, args.frames)
+
+    wall_start = time.perf_counter()
+    while True:
+        t0 = time.perf_counter()
+        frame = next(frames, None)
+        if frame is None:
+            break
+        t1 = time.perf_counter()
+
+        inferred = False
+        if model is not None and (gate is None or gate.should_infer(frame)):
+            recog = hand.HandRecog(model, None, None, frame, tracker=tracker)
+            inferred = True
+            if gate is not None:
+                gate.update(recog.handExists())
+        t2 = time.perf_counter()
+
+        if inferred:
+            control.update(recog.landmarks, recog.world_landmarks, recog.handedness, t0)
+        t3 = time.perf_counter()
+
+        index = controller.step(index, t3)
+        t4 = time.perf_counter()
+
+        if pixmaps[index] is not None:
+            canvas.set_pixmap(pixmaps[index])
+        target.fill(Qt.black)
+        canvas.render(target)
+        t5 = time.perf_counter()
+
+        times["capture"].append(t1 - t0)
+        times["recognition"].append(t2 - t1)
+        times["gesture"].append(t3 - t2)
+        times["index"].append(t4 - t3)
+        times["render"].append(t5 - t4)
+        times["total"].append(t5 - t0)
+    wall = time.perf_counter() - wall_start
+
+    if model is not None:
+        model.close()
+    app.processEvents()
+
+    report = make_report(args, times, wall)
+    if gate is not None:
+        report["gate"] = {"inferred": gate.inferred, "skipped": gate.skipped}
+    if tracker is not None:
+        report["tracker"] = {"roi": tracker.roi_count, "full": tracker.full_count}
+    return report
+
+
+def make_report(args, times, wall) -> dict:
+    ticks = len(times["total"])
+    return {
+        "platform": {
+            "machine": platform.machine(),
+            "system": platform.system(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "args": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+        "ticks": ticks,
+        "wall_s": wall,
+        "throughput_fps": ticks / wall if wall > 0 else 0.0,
+        "stages": {stage: summarize(samples) for stage, samples in times.items()},
+    }
+
+
+def newest_sample(telemetry, name, counts):
+    """이번 틱에 name 단계가 기록됐으면 그 값(초), 아니면 None. counts: 틱 전의 샘플 수"""
+    histogram = telemetry.histograms.get(name)
+    if histogram is None or histogram.count == counts.get(name, 0):
+        return None
+    return float(histogram.samples[(histogram.count - 1) % len(histogram.samples)])
+
+
+def run_worker(args):
+    """main.WithCameraUI의 실제 틱을 잰다 (CaptureThread -> InferenceWorker -> update_images)"""
+    if args.source != "synthetic" and os.path.isdir(args.source):
+        raise SystemExit("--worker needs 'synthetic' or a video file as --source")
+    # 앱과 같은 카메라 경로로 연다 (영상은 파일의 fps에 맞춰 나온다)
+    os.environ[camera_load.CAMERA_ENV] = "synthetic" if args.source == "synthetic" else "video:" + args.source
+    import main
+    main.ROI_TRACKING = args.tracking
+
+    app = QApplication.instance() or QApplication([])
+    config = dict(hand_worker.DEFAULT_HANDS_CONFIG, max_num_hands=args.max_num_hands)
+    window = main.WithCameraUI(hands_config=config)
+    # 틱은 여기서 직접 돌린다 (update_tick_rate는 간격만 바꾸고 타이머를 다시 시작하지 않음)
+    window.timer.stop()
+    window.resize(*args.window)
+    if args.model != window.path:
+        window.set_image(args.model)
+    telemetry = window.telemetry
+
+    try:
+        # 작업 프로세스 준비, 창 크기에 맞는 모델 프레임 로딩이 끝날 때까지는 재지 않는다
+        deadline = time.monotonic() + WARMUP_TIMEOUT
+        while not (window.worker.ready and window.pending_path is None and not window.loader.jobs
+                   and window.max_size == window.canvas.box_size):
+            if time.monotonic() > deadline:
+                raise TimeoutError("worker mode warm-up timed out")
+            window.update_images()
+            app.processEvents()
+            time.sleep(0.01)
+
+        target = QImage(window.canvas.size(), QImage.Format_ARGB32_Premultiplied)
+        times = {stage: [] for stage in STAGES + ("capture_to_result",)}
+        ticks = args.frames or 300
+
+        wall_start = time.perf_counter()
+        next_tick = wall_start
+        for _ in range(ticks):
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            counts = {name: histogram.count for name, histogram in telemetry.histograms.items()}
+            previous = window.canvas.pixmap
+            t0 = time.perf_counter()
+            window.update_images()
+            t1 = time.perf_counter()
+            presented = window.canvas.pixmap is not previous
+            if presented:
+                target.fill(Qt.black)
+                window.canvas.render(target)
+            t2 = time.perf_counter()
+            # 앱의 QTimer처럼 틱 간격은 UI가 정한다
+            next_tick = t0 + window.timer.interval() / 1000.0
+
+            sample = {name: newest_sample(telemetry, name, counts)
+                      for name in ("tick", "submit", "inference", "gesture", "gate", "pip", "capture_to_result")}
+            for stage, name in (("capture", "submit"), ("recognition", "inference"), ("gesture", "gesture"),
+                                ("capture_to_result", "capture_to_result")):
+                if sample[name] is not None:
+                    times[stage].append(sample[name])
+            if sample["tick"] is not None:
+                timed = sum(sample[i] or 0.0 for i in ("submit", "gesture", "gate", "pip"))
+                times["index"].append(max(sample["tick"] - timed, 0.0))
+            if presented:
+                times["render"].append(t2 - t1)
+            times["total"].append(t2 - t0)
+        wall = time.perf_counter() - wall_start
+    finally:
+        window.close()
+        app.processEvents()
+
+    report = make_report(args, times, wall)
+    report["gate"] = {"inferred": window.gate.inferred, "skipped": window.gate.skipped}
+    report["camera"] = {"dropped": window.capture.dropped, "repeated": window.capture.repeated}
+    report["counters"] = dict(telemetry.counters)
+    if window.qos is not None:
+        report["qos"] = {"level": window.qos.level.name, "changes": len(window.qos.changes)}
+    return report
+
+
+def print_report(report, baseline=None):
+    print(f"{report['ticks']} ticks in {report['wall_s']:.2f} s ({report['throughput_fps']:.1f} fps)")
+    print(f"{'stage':<18}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}" + ("    p50 vs baseline" if baseline else ""))
+    for stage, s in report["stages"].items():
+        if s is None:
+            continue
+        line = f"{stage:<18}{s['p50_ms']:>9.2f}{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}{s['max_ms']:>9.2f}"
+        base = (baseline or {}).get("stages", {}).get(stage)
+        if base and base["p50_ms"] > 0:
+            line += f"    x{s['p50_ms'] / base['p50_ms']:.2f}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="headless end-to-end latency benchmark")
+    parser.add_argument("--source", default="synthetic", help="'synthetic', a video file or a frame directory")
+    parser.add_argument("--frames", type=int, default=None,
+                        help="number of frames (synthetic default: 300), ticks with --worker (default: 300)")
+    parser.add_argument("--model", default=ui.RENDER_MODEL_PATHS[0], help="render model to draw")
+    parser.add_argument("--window", type=int, nargs=2, default=(800, 600), metavar=("W", "H"))
+    parser.add_argument("--max-num-hands", type=int, default=2)
+    parser.add_argument("--no-inference", action="store_true", help="skip MediaPipe (render path only)")
+    parser.add_argument("--tracking", action="store_true", help="use hand.RoiTracker")
+    parser.add_argument("--gate", action="store_true", help="use hand.MotionGate (--worker always does, like the app)")
+    parser.add_argument("--worker", action="store_true",
+                        help="run main.WithCameraUI's real tick: CaptureThread, InferenceWorker and update_images")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="baseline report (json) to compare p50 against")
+    args = parser.parse_args(argv)
+    if args.worker and args.no_inference:
+        parser.error("--worker always runs inference in the worker process")
+
+    report = run_worker(args) if args.worker else run(args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
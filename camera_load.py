@@ -1,52 +1,475 @@
+import os
 import sys
+import threading
+import time
 import numpy as np
 import cv2
 print("platform:", sys.platform)
 
-total_cam_open = False
+DEFAULT_SIZE = (640, 480)
 
-if sys.platform != "win32":
-    from picamera2 import Picamera2
+# 카메라 종류를 바꿀 때: HOLOGRAM_CAMERA=picamera2 | opencv[:index] | video:<path> | synthetic | fake
+CAMERA_ENV = "HOLOGRAM_CAMERA"
 
-def newCamera():
-    global total_cam_open
-    total_cam_open = True
 
-    if sys.platform == "win32":
-        cap = cv2.VideoCapture(0)
-        return cap
+def yuv420_to_rgb(yuv, size, dst=None):
+    """I420(YUV420 planar, (h * 3 / 2, w)) 버퍼를 RGB로 바꾼다. dst가 맞으면 dst에 채운다."""
+    w, h = size
+    yuv = yuv[:h * 3 // 2, :w]
+    if dst is not None and dst.shape == (h, w, 3):
+        return cv2.cvtColor(yuv, cv2.COLOR_YUV2RGB_I420, dst=dst)
+    return cv2.cvtColor(yuv, cv2.COLOR_YUV2RGB_I420)
+
+
+class CameraBackend:
+    """카메라 백엔드 공통 인터페이스
+
+    read(dst)는 main(미리보기) 스트림의 RGB(uint8, (h, w, 3)) 프레임을 돌려준다. dst가 주어지고
+    크기가 맞으면 새로 할당하지 않고 dst에 채운다. 더 읽을 프레임이 없으면 None을 돌려준다.
+
+    lores_size가 있으면 손 인식용 작은 스트림도 내놓는다. read_lores()는 작은 프레임만,
+    read_streams()는 같은 순간의 두 프레임을 돌려준다. 하드웨어 스트림이 없는 백엔드는
+    main 프레임을 줄여서 흉내낸다.
+    """
+
+    size = DEFAULT_SIZE
+    lores_size = None
+    opened = False
+    main_buffer = None  # lores를 흉내낼 때 main 프레임을 읽는 버퍼
+
+    @property
+    def shape(self):
+        return (self.size[1], self.size[0], 3)
+
+    @property
+    def lores_shape(self):
+        w, h = self.lores_size or self.size
+        return (h, w, 3)
+
+    def read(self, dst=None):
+        raise NotImplementedError
+
+    def read_lores(self, dst=None):
+        if self.lores_size is None:
+            return self.read(dst)
+        frame = self.read(self.main_buffer)
+        if frame is None:
+            return None
+        self.main_buffer = frame
+        return self.shrink(frame, dst)
+
+    def read_streams(self, main_dst=None, lores_dst=None):
+        """(main, lores)를 돌려준다. lores_size가 없으면 lores는 main과 같은 배열"""
+        frame = self.read(main_dst)
+        if frame is None:
+            return None, None
+        if self.lores_size is None:
+            return frame, frame
+        return frame, self.shrink(frame, lores_dst)
+
+    def shrink(self, frame, dst):
+        if dst is None or dst.shape != self.lores_shape:
+            dst = np.empty(self.lores_shape, dtype=np.uint8)
+        return cv2.resize(frame, self.lores_size, dst=dst, interpolation=cv2.INTER_AREA)
+
+    def close(self):
+        self.opened = False
+
+    def fits(self, dst):
+        return dst is not None and dst.shape == self.shape
+
+
+class Picamera2Backend(CameraBackend):
+    """라즈베리파이 카메라. 캡처 버퍼를 복사 없이 매핑해서 dst로 바로 옮긴다.
+
+    lores_size를 주면 ISP가 만든 작은 YUV420 스트림을 같이 설정한다. read_lores()는
+    큰 main 버퍼를 건드리지 않고 작은 버퍼만 RGB로 바꾸므로 프레임마다 복사/변환하는 양이 줄어든다.
+    (lores 너비는 64의 배수여야 줄 끝 여백 없이 매핑된다)
+    """
+
+    def __init__(self, size=DEFAULT_SIZE, lores_size=None):
+        # 카메라가 없는 환경(벤치마크 등)에서도 이 모듈을 import할 수 있도록 여기서 import
+        from picamera2 import Picamera2
+        from picamera2 import MappedArray
+        self.MappedArray = MappedArray
+
+        self.size = tuple(size)
+        self.lores_size = tuple(lores_size) if lores_size else None
+        self.picam2 = Picamera2()
+        # picamera2의 BGR888은 메모리에 [R, G, B] 순서로 저장된다 -> 색 변환이 필요 없음
+        streams = {"main": {"size": self.size, "format": "BGR888"}}
+        if self.lores_size is not None:
+            streams["lores"] = {"size": self.lores_size, "format": "YUV420"}
+        camera_config = self.picam2.create_preview_configuration(**streams)
+        self.picam2.configure(camera_config)
+        self.picam2.start()
+        self.opened = True
+
+    def copy_main(self, request, dst):
+        if not self.fits(dst):
+            dst = np.empty(self.shape, dtype=np.uint8)
+        with self.MappedArray(request, "main") as m:
+            np.copyto(dst, m.array[:, :, :3])
+        return dst
+
+    def copy_lores(self, request, dst):
+        with self.MappedArray(request, "lores") as m:
+            return yuv420_to_rgb(m.array, self.lores_size, dst)
+
+    def read(self, dst=None):
+        request = self.picam2.capture_request()
+        try:
+            return self.copy_main(request, dst)
+        finally:
+            request.release()
+
+    def read_lores(self, dst=None):
+        if self.lores_size is None:
+            return self.read(dst)
+        request = self.picam2.capture_request()
+        try:
+            return self.copy_lores(request, dst)
+        finally:
+            request.release()
+
+    def read_streams(self, main_dst=None, lores_dst=None):
+        if self.lores_size is None:
+            return super().read_streams(main_dst, lores_dst)
+        request = self.picam2.capture_request()
+        try:
+            return self.copy_main(request, main_dst), self.copy_lores(request, lores_dst)
+        finally:
+            request.release()
+
+    def close(self):
+        super().close()
+        self.picam2.stop()
+
+
+class OpenCVBackend(CameraBackend):
+    """cv2.VideoCapture 카메라. BGR 버퍼를 재사용하고 dst로 바로 색 변환한다."""
+
+    def __init__(self, source=0, size=None):
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"camera is not open: {source}")
+        if size is not None:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+        self.size = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.bgr = None
+        self.opened = True
+
+    def grab_bgr(self):
+        ret, frame = self.cap.read(self.bgr)
+        if not ret:
+            return None
+        self.bgr = frame
+        return frame
+
+    def read(self, dst=None):
+        frame = self.grab_bgr()
+        if frame is None:
+            raise RuntimeError("camera read failed.")
+        return self.convert(frame, dst)
+
+    def convert(self, frame, dst):
+        h, w = frame.shape[:2]
+        self.size = (w, h)
+        if not self.fits(dst):
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=dst)
+
+    def close(self):
+        super().close()
+        self.cap.release()
+
+
+class VideoFileBackend(OpenCVBackend):
+    """녹화한 영상(또는 frame_%04d.png 같은 이미지 시퀀스)을 카메라처럼 재생한다.
+
+    loop=True면 끝에서 처음으로 돌아가고, realtime=True면 영상의 fps에 맞춰 기다린다."""
+
+    def __init__(self, path, loop=True, realtime=False):
+        super().__init__(path)
+        self.loop = loop
+        fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.interval = 1.0 / fps if realtime and fps > 0 else 0.0
+        self.next_time = time.monotonic()
+
+    def read(self, dst=None):
+        frame = self.grab_bgr()
+        if frame is None and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            frame = self.grab_bgr()
+        if frame is None:
+            return None
+
+        if self.interval:
+            self.next_time += self.interval
+            delay = self.next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return self.convert(frame, dst)
+
+
+class SyntheticBackend(CameraBackend):
+    """어두운 배경 위에서 원을 그리며 움직이는 밝은 원 (결정적인 가짜 카메라)
+
+    fps를 주면 실제 카메라처럼 그 속도로만 프레임을 내놓는다."""
+
+    def __init__(self, size=DEFAULT_SIZE, fps=None, period=90, count=None):
+        self.size = tuple(size)
+        self.interval = 1.0 / fps if fps else 0.0
+        self.period = period
+        self.count = count
+        self.n = 0
+        self.next_time = time.monotonic()
+        self.opened = True
+
+    def draw(self, dst, size):
+        w, h = size
+        angle = 2 * np.pi * self.n / self.period
+        center = (int(w / 2 + w / 4 * np.cos(angle)), int(h / 2 + h / 4 * np.sin(angle)))
+        dst[:] = 16
+        cv2.circle(dst, center, h // 8, (220, 180, 160), cv2.FILLED)
+        return dst
+
+    def next_frame(self) -> bool:
+        """다음 프레임 차례가 되면(fps) True, 더 내놓을 프레임이 없으면 False"""
+        if self.count is not None and self.n >= self.count:
+            return False
+        self.n += 1
+        if self.interval:
+            self.next_time += self.interval
+            delay = self.next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return True
+
+    def read(self, dst=None):
+        if not self.next_frame():
+            return None
+        if not self.fits(dst):
+            dst = np.empty(self.shape, dtype=np.uint8)
+        return self.draw(dst, self.size)
+
+
+class FakeDualStreamBackend(SyntheticBackend):
+    """Picamera2의 main(RGB) + lores(YUV420) 두 스트림을 흉내내는 가짜 카메라
+
+    장치 없이 lores 경로(YUV420 -> RGB 변환, 스트림별 버퍼)를 시험할 때 쓴다.
+    ISP처럼 lores 프레임은 main을 줄이지 않고 작은 크기로 바로 만든다.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE, lores_size=(320, 240), fps=None, period=90, count=None):
+        super().__init__(size, fps, period, count)
+        self.lores_size = tuple(lores_size)
+        w, h = self.lores_size
+        self.lores_rgb = np.empty((h, w, 3), dtype=np.uint8)
+        self.lores_yuv = None  # 장치가 채우는 YUV420 버퍼 흉내
+
+    def capture_lores(self):
+        self.draw(self.lores_rgb, self.lores_size)
+        self.lores_yuv = cv2.cvtColor(self.lores_rgb, cv2.COLOR_RGB2YUV_I420, dst=self.lores_yuv)
+
+    def read_lores(self, dst=None):
+        if not self.next_frame():
+            return None
+        self.capture_lores()
+        return yuv420_to_rgb(self.lores_yuv, self.lores_size, dst)
+
+    def read_streams(self, main_dst=None, lores_dst=None):
+        if not self.next_frame():
+            return None, None
+        if not self.fits(main_dst):
+            main_dst = np.empty(self.shape, dtype=np.uint8)
+        self.capture_lores()
+        return self.draw(main_dst, self.size), yuv420_to_rgb(self.lores_yuv, self.lores_size, lores_dst)
+
+
+def newCamera(kind=None, size=DEFAULT_SIZE, lores_size=None) -> CameraBackend:
+    """kind: "picamera2", "opencv[:index]", "video:<path>", "synthetic", "fake"
+    주어지지 않으면 HOLOGRAM_CAMERA 환경 변수, 그것도 없으면 플랫폼 기본값을 쓴다.
+    lores_size: 손 인식용 작은 스트림 크기 (None이면 main 스트림 하나만)"""
+    kind = kind or os.environ.get(CAMERA_ENV)
+    if not kind:
+        kind = "opencv" if sys.platform == "win32" else "picamera2"
+
+    name, _, arg = kind.partition(":")
+    if name == "picamera2":
+        return Picamera2Backend(size, lores_size)
+    if name == "fake":
+        return FakeDualStreamBackend(size, lores_size or (320, 240), fps=30)
+
+    if name == "opencv":
+        camera = OpenCVBackend(int(arg) if arg else 0)
+    elif name == "video":
+        # 카메라 대신 쓰므로 영상의 fps에 맞춰 내놓는다 (최대 속도로 디코딩하는 것은 benchmark.py만)
+        camera = VideoFileBackend(arg, realtime=True)
+    elif name == "synthetic":
+        camera = SyntheticBackend(size, fps=30)
     else:
-        picam2 = Picamera2()
-        camera_config = picam2.create_preview_configuration(main={"size": (640, 480)})
-        picam2.configure(camera_config)
-        picam2.start()
-        return picam2
+        raise ValueError(f"unknown camera backend: {kind}")
+    # 하드웨어 lores 스트림이 없으면 main 프레임을 줄여서 쓴다
+    camera.lores_size = tuple(lores_size) if lores_size else None
+    return camera
 
 # it returns rgb frame
-def getFrame(camera):
-    if not total_cam_open:
+def getFrame(camera, dst=None):
+    if not camera.opened:
         return np.zeros([100, 100, 3], dtype=np.uint8)
-    
-    if sys.platform == "win32":
-        if not camera.isOpened():
-            raise RuntimeError("windows: camera is not open.")
-        ret, frame = camera.read()
-        if not ret:
-            raise RuntimeError("windows: rat is false.")
-        
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        return frame_rgb
-    else:
-        frame = picam2.capture_array()
-        frame = np.ascontiguousarray(frame, dtype=np.uint8)
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        return frame_rgb
+    return camera.read(dst)
+
+# 손 인식용 (lores 스트림이 없으면 main과 같음)
+def getLoresFrame(camera, dst=None):
+    if not camera.opened:
+        return np.zeros([100, 100, 3], dtype=np.uint8)
+    return camera.read_lores(dst)
 
 def closeCamera(camera):
-    global total_cam_open
-    total_cam_open = False
+    camera.close()
 
-    if sys.platform == "win32":
-        camera.release()
-    else:
-        camera.stop()
\ No newline at end of file
+
+class FrameRing:
+    """미리 할당한 버퍼를 돌려쓰는 최신 프레임 버퍼 (트리플 버퍼링)
+
+    쓰는 쪽은 가장 최신 프레임과 읽는 쪽이 쓰고 있는 프레임을 건드리지 않으므로
+    read()가 돌려준 배열은 다음 read() 호출 전까지 바뀌지 않는다.
+    """
+
+    def __init__(self, slots=3):
+        if slots < 3:
+            raise ValueError("FrameRing needs at least 3 slots.")
+        self.slot_count = slots
+        self.buffers = None
+        self.timestamps = [0.0] * slots
+        self.lock = threading.Lock()
+
+        self.latest_slot = -1  # 가장 최근에 완성된 프레임
+        self.reading_slot = -1  # 읽는 쪽이 사용 중인 프레임
+        self.seq = 0  # 지금까지 쓴 프레임 수
+        self.read_seq = 0  # 마지막으로 읽은 프레임 번호
+
+        # 통계
+        self.dropped = 0  # 읽히기 전에 새 프레임으로 덮인 프레임 수
+        self.repeated = 0  # 새 프레임이 없어서 같은 프레임을 다시 읽은 횟수 (카메라가 더 느림)
+
+    def acquire(self):
+        """다음에 쓸 (슬롯 번호, 버퍼)를 돌려준다. 아직 프레임 크기를 모르면 버퍼는 None"""
+        with self.lock:
+            for i in range(self.slot_count):
+                if i != self.latest_slot and i != self.reading_slot:
+                    return i, (None if self.buffers is None else self.buffers[i])
+
+    def commit(self, slot, frame):
+        """acquire()로 받은 슬롯을 가장 최근 프레임으로 만든다.
+
+        frame이 그 슬롯의 버퍼가 아니면(첫 프레임이거나 크기가 바뀐 경우) 버퍼로 복사한다."""
+        if self.buffers is None or self.buffers[slot] is not frame:
+            if self.buffers is None or self.buffers[0].shape != frame.shape:
+                with self.lock:
+                    self.buffers = [np.empty_like(frame) for _ in range(self.slot_count)]
+                    self.latest_slot = -1
+                    self.reading_slot = -1
+            np.copyto(self.buffers[slot], frame)
+        timestamp = time.monotonic()
+
+        with self.lock:
+            self.timestamps[slot] = timestamp
+            if self.seq > self.read_seq:
+                self.dropped += 1
+            self.latest_slot = slot
+            self.seq += 1
+
+    def write(self, frame):
+        slot, _ = self.acquire()
+        self.commit(slot, frame)
+
+    def read(self):
+        """(frame, timestamp, seq) 를 돌려준다. 아직 프레임이 없으면 (None, 0.0, 0)"""
+        with self.lock:
+            if self.latest_slot < 0:
+                return None, 0.0, 0
+            if self.seq == self.read_seq:
+                self.repeated += 1
+            self.reading_slot = self.latest_slot
+            self.read_seq = self.seq
+            return self.buffers[self.reading_slot], self.timestamps[self.reading_slot], self.seq
+
+
+class CaptureThread(threading.Thread):
+    """카메라에서 계속 프레임을 읽어 FrameRing에 채우는 스레드
+
+    ring에는 손 인식용 프레임(lores 스트림이 있으면 lores)을 채우고,
+    preview=True면 같은 순간의 main 프레임을 preview_ring에 따로 채운다.
+
+    camera 대신 카메라를 여는 함수를 주면 스레드 안에서 열고 닫는다.
+    (카메라를 여는 동안 창이 먼저 뜬다)
+    """
+
+    def __init__(self, camera, slots=3, preview=False):
+        super().__init__(name="camera-capture", daemon=True)
+        if isinstance(camera, CameraBackend):
+            self.camera = camera
+            self.open_camera = None
+        else:
+            self.camera = None
+            self.open_camera = camera
+        self.ring = FrameRing(slots)
+        self.preview_ring = FrameRing(slots) if preview else None
+        self.running = False
+        self.error = None
+
+    def start(self):
+        self.running = True
+        super().start()
+
+    def run(self):
+        try:
+            if self.camera is None:
+                self.camera = self.open_camera()
+            while self.running:
+                # 백엔드가 링 버퍼에 바로 채우므로 프레임마다 새로 할당하지 않는다
+                slot, buffer = self.ring.acquire()
+                if self.preview_ring is None:
+                    frame = getLoresFrame(self.camera, buffer)
+                else:
+                    preview_slot, preview_buffer = self.preview_ring.acquire()
+                    preview, frame = self.camera.read_streams(preview_buffer, buffer)
+                if frame is None:
+                    # 영상 파일의 끝
+                    break
+                if self.preview_ring is not None:
+                    self.preview_ring.commit(preview_slot, preview)
+                self.ring.commit(slot, frame)
+        except Exception as e:
+            self.error = e
+        self.running = False
+        if self.open_camera is not None and self.camera is not None:
+            closeCamera(self.camera)
+
+    def latest(self):
+        """가장 최근 프레임을 기다리지 않고 돌려준다: (frame, timestamp, seq)"""
+        if self.error is not None:
+            raise RuntimeError("camera capture failed") from self.error
+        return self.ring.read()
+
+    def latest_preview(self):
+        """가장 최근 main(미리보기) 프레임: (frame, timestamp, seq)"""
+        if self.preview_ring is None:
+            raise RuntimeError("capture thread was started without preview")
+        return self.preview_ring.read()
+
+    @property
+    def dropped(self) -> int:
+        return self.ring.dropped
+
+    @property
+    def repeated(self) -> int:
+        return self.ring.repeated
+
+    def stop(self):
+        self.running = False
+        if self.is_alive():
+            self.join(timeout=1.0)
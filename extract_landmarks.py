@@ -0,0 +1,280 @@
+"""녹화한 영상이나 프레임 폴더에서 손 랜드마크를 한꺼번에 뽑아 저장하고, 저장한 값으로 임계값을 고른다
+
+extract: 영상을 구간(chunk)으로 나눠 프로세스 풀에서 인식한다. 작업 프로세스마다 Hands를 하나씩 만든다.
+         소스마다 <out>/<이름>.npz 하나에 프레임별 열(column) 배열로 저장한다.
+sweep:   저장한 랜드마크로 hand.py의 FINGER_CLOSE_THRESHOLD, PICKING_GESTURE_THRESHOLD, STABLE_RADIUS
+         후보 값을 바꿔 가며 판정 비율과 깜빡임(초당 전환 횟수)을 계산한다. 인식을 다시 돌리지 않는다.
+
+사용법:
+    python extract_landmarks.py extract recordings/*.mp4 ./frames --out landmarks --workers 4
+    python extract_landmarks.py sweep landmarks/*.npz --picking 0.01 0.06 0.005
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+import hand
+import hand_worker
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg")
+HANDEDNESS = {"Left": 0, "Right": 1}
+CHUNK_FRAMES = 1800
+
+# 작업 프로세스마다 하나
+model = None
+
+
+##############################################################################
+# extract
+
+def init_worker(hands_config):
+    global model
+    import mediapipe as mp
+    model = mp.solutions.hands.Hands(**hands_config)
+
+
+def image_names(path):
+    return sorted(i for i in os.listdir(path) if i.lower().endswith(IMAGE_EXTS))
+
+
+def source_info(source):
+    """(frame_count, fps). 폴더는 fps를 알 수 없으므로 0"""
+    if os.path.isdir(source):
+        return len(image_names(source)), 0.0
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f"cannot open {source}")
+    count, fps = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return count, fps
+
+
+def read_frames(source, start, stop):
+    """(frame_index, rgb) 를 차례로 내놓는다."""
+    if os.path.isdir(source):
+        for i, name in enumerate(image_names(source)[start:stop], start):
+            frame = cv2.imread(os.path.join(source, name), cv2.IMREAD_COLOR)
+            if frame is not None:
+                yield i, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return
+
+    cap = cv2.VideoCapture(source)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    bgr = rgb = None
+    try:
+        for i in range(start, stop):
+            ok, bgr = cap.read(bgr)
+            if not ok:
+                break
+            rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=rgb)
+            yield i, rgb
+    finally:
+        cap.release()
+
+
+def empty_columns(n, max_hands):
+    return {
+        "frame_index": np.zeros(n, dtype=np.int32),
+        "hand_count": np.zeros(n, dtype=np.uint8),
+        "landmarks": np.full((n, max_hands, 21, 3), np.nan, dtype=np.float32),
+        "world_landmarks": np.full((n, max_hands, 21, 3), np.nan, dtype=np.float32),
+        "handedness": np.full((n, max_hands), -1, dtype=np.int8),
+        "handedness_score": np.zeros((n, max_hands), dtype=np.float32),
+    }
+
+
+def extract_chunk(source, start, stop, max_hands):
+    # 구간마다 추적 상태를 초기화한다 (다른 구간/소스의 손 위치를 이어받지 않게)
+    model.reset()
+    columns = empty_columns(stop - start, max_hands)
+    n = 0
+    for i, frame in read_frames(source, start, stop):
+        landmarks, world, handedness = hand.results_to_arrays(model.process(frame))
+        k = min(len(landmarks), max_hands)
+        columns["frame_index"][n] = i
+        columns["hand_count"][n] = k
+        columns["landmarks"][n, :k] = landmarks[:k]
+        columns["world_landmarks"][n, :k] = world[:k]
+        for j, (label, score) in enumerate(handedness[:k]):
+            columns["handedness"][n, j] = HANDEDNESS.get(label, -1)
+            columns["handedness_score"][n, j] = score
+        n += 1
+    return {name: column[:n] for name, column in columns.items()}
+
+
+def gesture_columns(world_landmarks):
+    """현재 hand.py 임계값으로 계산한 제스처 값과 판정 (손이 없는 칸은 NaN / False)"""
+    n, h = world_landmarks.shape[:2]
+    flat = world_landmarks.reshape(n * h, 21, 3)
+    extents = hand.finger_extents(flat).reshape(n, h, 5)
+    picking = hand.picking_distances(flat).reshape(n, h)
+    with np.errstate(invalid="ignore"):
+        finger_close = extents <= hand.FINGER_CLOSE_THRESHOLD
+        return {
+            "finger_extent": extents.astype(np.float32),
+            "picking_distance": picking.astype(np.float32),
+            "finger_close": finger_close,
+            "all_close": np.all(finger_close[..., 1:], axis=-1),
+            "picking": picking <= hand.PICKING_GESTURE_THRESHOLD,
+        }
+
+
+def output_path(out_dir, source):
+    name = os.path.basename(os.path.normpath(source))
+    return os.path.join(out_dir, os.path.splitext(name)[0] + ".npz")
+
+
+def extract_main(args):
+    config = dict(hand_worker.DEFAULT_HANDS_CONFIG, max_num_hands=args.max_num_hands)
+    os.makedirs(args.out, exist_ok=True)
+
+    # 소스마다 (구간 목록, fps)
+    tasks = {}
+    for source in args.sources:
+        count, fps = source_info(source)
+        tasks[source] = ([(start, min(start + args.chunk, count)) for start in range(0, count, args.chunk)], fps)
+
+    start_time = time.perf_counter()
+    total = 0
+    with ProcessPoolExecutor(args.workers, initializer=init_worker, initargs=(config,)) as pool:
+        # 모든 구간을 먼저 예약해서 소스가 적어도 모든 작업 프로세스가 쉬지 않게 한다
+        futures = {
+            source: [pool.submit(extract_chunk, source, a, b, args.max_num_hands) for a, b in chunks]
+            for source, (chunks, _) in tasks.items()
+        }
+        for source, chunk_futures in futures.items():
+            parts = [f.result() for f in chunk_futures]
+            columns = {name: np.concatenate([p[name] for p in parts]) for name in parts[0]} if parts \
+                else empty_columns(0, args.max_num_hands)
+            columns.update(gesture_columns(columns["world_landmarks"]))
+
+            path = output_path(args.out, source)
+            save = np.savez_compressed if args.compress else np.savez
+            save(path, fps=np.float32(tasks[source][1]),
+                 finger_close_threshold=hand.FINGER_CLOSE_THRESHOLD,
+                 picking_gesture_threshold=hand.PICKING_GESTURE_THRESHOLD, **columns)
+
+            n = len(columns["frame_index"])
+            total += n
+            found = int(np.count_nonzero(columns["hand_count"]))
+            print(f"{source} -> {path}: {n} frames, hands in {found} ({time.perf_counter() - start_time:.1f}s)",
+                  flush=True)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"{total} frames in {elapsed:.1f}s ({total / elapsed if elapsed > 0 else 0:.1f} frames/s)")
+
+
+##############################################################################
+# sweep
+
+def load_sets(paths):
+    for path in paths:
+        with np.load(path) as data:
+            fps = float(data["fps"]) or 30.0
+            yield path, data["world_landmarks"], data["landmarks"], fps
+
+
+def thresholds(spec):
+    start, stop, step = spec
+    return np.round(np.arange(start, stop + step / 2, step), 6)
+
+
+def toggle_rate(flag_sets, fps):
+    """첫 번째 손의 판정이 초당 몇 번 바뀌는지 (깜빡임, 모든 파일 합계)"""
+    toggles = sum(int(np.count_nonzero(f[1:] != f[:-1])) for f in flag_sets)
+    seconds = sum(max(len(f) - 1, 0) / r for f, r in zip(flag_sets, fps))
+    return toggles / seconds if seconds > 0 else 0.0
+
+
+def stabilize(points, radius):
+    """hand.Stabilizer와 같은 규칙: (고정된 비율, 원래 위치와의 평균 거리)"""
+    held = 0
+    lag = 0.0
+    prev = None
+    for p in points:
+        if prev is not None and np.linalg.norm(prev - p) < radius:
+            held += 1
+            lag += float(np.linalg.norm(prev - p))
+        else:
+            prev = p
+    n = max(len(points), 1)
+    return held / n, lag / n
+
+
+def sweep_main(args):
+    sets = list(load_sets(args.files))
+    hands = [(world[:, 0], image[:, 0], fps) for _, world, image, fps in sets]
+    valid = [~np.isnan(w[:, 0, 0]) for w, _, _ in hands]
+    frames = sum(int(v.sum()) for v in valid)
+    print(f"{len(sets)} files, {frames} frames with a hand")
+    report = {"frames": frames, "finger_close": [], "picking": [], "stable_radius": []}
+
+    # 제스처 값은 한 번만 계산하고 임계값만 바꿔 비교한다
+    extents = [hand.finger_extents(w[v]) for (w, _, _), v in zip(hands, valid)]
+    picking = [hand.picking_distances(w[v]) for (w, _, _), v in zip(hands, valid)]
+    fps = [f for _, _, f in hands]
+
+    print(f"\n{'finger':>8}{'all_close':>11}{'toggles/s':>11}")
+    for t in thresholds(args.finger):
+        flags = [np.all(e[:, 1:] <= t, axis=-1) for e in extents]
+        rate = sum(int(f.sum()) for f in flags) / max(frames, 1)
+        toggles = toggle_rate(flags, fps)
+        report["finger_close"].append({"threshold": float(t), "rate": rate, "toggles_per_s": toggles})
+        print(f"{t:>8.3f}{rate:>11.3f}{toggles:>11.2f}")
+
+    print(f"\n{'picking':>8}{'picking':>11}{'toggles/s':>11}")
+    for t in thresholds(args.picking):
+        flags = [d <= t for d in picking]
+        rate = sum(int(f.sum()) for f in flags) / max(frames, 1)
+        toggles = toggle_rate(flags, fps)
+        report["picking"].append({"threshold": float(t), "rate": rate, "toggles_per_s": toggles})
+        print(f"{t:>8.3f}{rate:>11.3f}{toggles:>11.2f}")
+
+    # STABLE_RADIUS는 getStandardPoint(중지 MCP, 정규화 이미지 좌표)에 쓰인다
+    points = [image[v][:, 9, :2] for (_, image, _), v in zip(hands, valid)]
+    print(f"\n{'stable':>8}{'held':>11}{'lag':>11}")
+    for t in thresholds(args.stable):
+        results = [stabilize(p, t) for p in points if len(p)]
+        held = float(np.mean([r[0] for r in results])) if results else 0.0
+        lag = float(np.mean([r[1] for r in results])) if results else 0.0
+        report["stable_radius"].append({"threshold": float(t), "held": held, "lag": lag})
+        print(f"{t:>8.3f}{held:>11.3f}{lag:>11.4f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="batch hand landmark extraction and threshold sweeps")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("extract", help="run MediaPipe over videos / frame folders")
+    p.add_argument("sources", nargs="+", help="video files or frame directories")
+    p.add_argument("--out", default="landmarks", help="output directory for <name>.npz")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (one Hands each)")
+    p.add_argument("--chunk", type=int, default=CHUNK_FRAMES, help="frames per task")
+    p.add_argument("--max-num-hands", type=int, default=2)
+    p.add_argument("--compress", action="store_true", help="np.savez_compressed")
+    p.set_defaults(func=extract_main)
+
+    p = sub.add_parser("sweep", help="evaluate gesture thresholds on extracted landmarks")
+    p.add_argument("files", nargs="+", help=".npz files written by extract")
+    p.add_argument("--finger", type=float, nargs=3, default=(0.03, 0.10, 0.01), metavar=("START", "STOP", "STEP"))
+    p.add_argument("--picking", type=float, nargs=3, default=(0.01, 0.06, 0.005), metavar=("START", "STOP", "STEP"))
+    p.add_argument("--stable", type=float, nargs=3, default=(0.002, 0.02, 0.002), metavar=("START", "STOP", "STEP"))
+    p.add_argument("--json", help="write the sweep table to this file")
+    p.set_defaults(func=sweep_main)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""render/model_N 폴더의 PNG 프레임을 하나의 파일로 묶는 아카이브 형식
+
+파일 구조 (little endian)
+    header : magic(4) version(u16) compression(u16) frame_count(u32) width(u32) height(u32) reserved(12)
+    index  : frame_count * (offset(u64), length(u64))
+    data   : 프레임마다 RGBA8888 픽셀 (페이지 크기에 맞춰 정렬)
+
+압축하지 않은 아카이브는 mmap으로 열어 복사 없이 QImage를 만들 수 있으므로
+프레임을 읽는 비용이 PNG 디코딩이 아니라 페이지 읽기 비용이 된다.
+
+사용법: python frame_archive.py render/model_1 render/model_2 [--compress]
+"""
+from PyQt5.QtGui import QImage
+import argparse
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+
+import model_manifest
+
+MAGIC = b"HFRA"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIII12x")
+INDEX_ENTRY = struct.Struct("<QQ")
+PAGE_SIZE = 4096
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+
+ARCHIVE_EXT = ".hfa"
+
+
+def archive_path(model_path, box_size=None) -> str:
+    # ./render/model_1 -> ./render/model_1.hfa
+    # box_size가 있으면 bake.py가 만든 표시용 크기: ./render/model_1.450.hfa
+    if box_size is None:
+        return os.path.normpath(model_path) + ARCHIVE_EXT
+    return f"{os.path.normpath(model_path)}.{box_size}{ARCHIVE_EXT}"
+
+
+def find_lods(model_path) -> dict:
+    """model_path에 대해 만들어 둔 표시용 크기별 아카이브: {box_size: path}"""
+    directory, name = os.path.split(os.path.normpath(model_path))
+    pattern = re.compile(re.escape(name) + r"\.(\d+)" + re.escape(ARCHIVE_EXT) + "$")
+    lods = {}
+    for entry in os.listdir(directory or "."):
+        match = pattern.match(entry)
+        if match is not None:
+            lods[int(match.group(1))] = os.path.join(directory, entry)
+    return lods
+
+
+def read_header(path):
+    """mmap 없이 헤더만 읽는다: (compression, frame_count, width, height)"""
+    with open(path, "rb") as f:
+        data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError(f"truncated frame archive: {path}")
+    magic, version, *fields = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError(f"not a frame archive: {path}")
+    if version != VERSION:
+        raise ValueError(f"unsupported frame archive version {version}: {path}")
+    return tuple(fields)
+
+
+def align(n, size=PAGE_SIZE):
+    return (n + size - 1) // size * size
+
+
+class FrameArchive:
+    """mmap으로 연 프레임 아카이브
+
+    여러 작업 스레드에서 동시에 frame_image()를 호출해도 된다.
+    반환된 QImage는 아카이브 메모리를 직접 가리키므로 읽기 전용으로만 쓴다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.compression, self.frame_count, self.width, self.height = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"not a frame archive: {path}")
+        if version != VERSION:
+            raise ValueError(f"unsupported frame archive version {version}: {path}")
+
+        self.index = [
+            INDEX_ENTRY.unpack_from(self.mm, HEADER.size + i * INDEX_ENTRY.size)
+            for i in range(self.frame_count)
+        ]
+        self.bytes_per_line = self.width * 4
+
+    def frame_data(self, i):
+        offset, length = self.index[i]
+        data = memoryview(self.mm)[offset:offset + length]
+        if self.compression == COMPRESSION_ZLIB:
+            return zlib.decompress(data)
+        return data
+
+    def frame_image(self, i) -> QImage:
+        # PyQt가 data의 참조를 유지하므로 QImage가 살아있는 동안 mmap도 유지된다
+        return QImage(self.frame_data(i), self.width, self.height, self.bytes_per_line, QImage.Format_RGBA8888)
+
+    def close(self):
+        try:
+            self.mm.close()
+        except BufferError:
+            # 아직 쓰이는 QImage가 있으면 GC에 맡긴다
+            pass
+
+
+class ArchiveWriter:
+    """프레임을 하나씩 기록하고 close()에서 인덱스를 채운다 (모든 프레임을 메모리에 올리지 않음)"""
+
+    def __init__(self, path, frame_count, compress=False):
+        self.path = path
+        self.frame_count = frame_count
+        self.compression = COMPRESSION_ZLIB if compress else COMPRESSION_NONE
+        self.size = None
+        self.index = []
+
+        self.tmp_path = path + ".tmp"
+        self.file = open(self.tmp_path, "wb")
+        self.offset = align(HEADER.size + INDEX_ENTRY.size * frame_count)
+
+    def add_rgba(self, data, width, height):
+        """data: 줄 끝 여백 없는 RGBA8888 픽셀 (bytes 또는 C 연속 배열)"""
+        if self.size is None:
+            self.size = (width, height)
+        elif (width, height) != self.size:
+            raise ValueError("all frames must have the same size")
+
+        if self.compression == COMPRESSION_ZLIB:
+            data = zlib.compress(data, 1)
+        length = memoryview(data).nbytes
+
+        self.file.seek(self.offset)
+        self.file.write(data)
+        self.index.append((self.offset, length))
+        self.offset = align(self.offset + length)
+
+    def add_image(self, image: QImage):
+        image = image.convertToFormat(QImage.Format_RGBA8888)
+        width, height = image.width(), image.height()
+        data = image.constBits().asstring(image.sizeInBytes())
+        if image.bytesPerLine() != width * 4:
+            # 줄 끝 여백 제거
+            bpl = image.bytesPerLine()
+            data = b"".join(data[y * bpl:y * bpl + width * 4] for y in range(height))
+        self.add_rgba(data, width, height)
+
+    def close(self):
+        try:
+            if len(self.index) != self.frame_count:
+                raise ValueError(f"expected {self.frame_count} frames, got {len(self.index)}")
+            self.file.seek(0)
+            self.file.write(HEADER.pack(MAGIC, VERSION, self.compression, self.frame_count, *self.size))
+            for entry in self.index:
+                self.file.write(INDEX_ENTRY.pack(*entry))
+        finally:
+            self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def write_archive(path, frame_count, images, compress=False):
+    """images: 크기가 모두 같은 QImage를 차례로 내놓는 iterable"""
+    writer = ArchiveWriter(path, frame_count, compress)
+    try:
+        for image in images:
+            writer.add_image(image)
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def build(model_path, compress=False) -> str:
+    # load_image는 보정하지 않은 PNG에 밝기를 적용하므로 bake.py가 만든 아카이브와 밝기가 같다
+    manifest = model_manifest.ModelManifest(model_path, use_archive=False)
+    path = archive_path(model_path)
+    write_archive(path, manifest.frame_count, map(manifest.load_image, range(manifest.frame_count)), compress)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="pack render/model_N PNG frames into one archive")
+    parser.add_argument("models", nargs="+", help="model folders (e.g. ./render/model_1)")
+    parser.add_argument("--compress", action="store_true", help="zlib level 1 per frame (smaller, not zero-copy)")
+    args = parser.parse_args(argv)
+
+    for model_path in args.models:
+        path = build(model_path, args.compress)
+        print(f"{model_path} -> {path} ({os.path.getsize(path) / 2**20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import Qt
+from collections import OrderedDict
+
+# 기본 메모리 한도: 512MB
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def pixmap_bytes(pixmap: QPixmap) -> int:
+    return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+
+def build_frame(original, max_size):
+    """원본 이미지(QPixmap 또는 QImage)를 max_size 안에 맞게 크기 조정한다. 회전은 그릴 때 한다.
+
+    이미 맞는 크기로 구워 둔 이미지(bake.py)는 그대로 돌려준다.
+    """
+    size = original.size().scaled(max_size[0], max_size[1], Qt.KeepAspectRatio)
+    if size == original.size():
+        return original
+    return original.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+
+class FrameCache:
+    """모델별로 미리 크기 조정된 프레임을 보관하는 LRU 캐시
+
+    인덱스마다 픽스맵 하나를 저장하고,
+    아직 로드되지 않은(또는 지워진) 프레임은 None으로 둔다.
+    전체 크기가 max_bytes를 넘으면 고정(pin)되지 않은 모델 중 가장 오래 쓰이지 않은 것부터 지우고,
+    그래도 넘으면 고정된 모델에서 현재 인덱스(focus)로부터 가장 먼 프레임부터 지운다.
+    그래서 한 모델의 프레임 수가 한도보다 많아도(360, 720장) 현재 위치 주변만 메모리에 남는다.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.models: OrderedDict[tuple, list] = OrderedDict()
+        self.model_bytes: dict[tuple, int] = {}
+        self.total_bytes = 0
+        self.pinned: set[tuple] = set()
+        self.focus: dict[tuple, int] = {}
+        self.frame_bytes: dict[tuple, int] = {}  # 모델별 프레임 하나의 크기
+
+    def frames(self, key, frame_count) -> list:
+        if key not in self.models:
+            self.models[key] = [None] * frame_count
+            self.model_bytes[key] = 0
+        return self.models[key]
+
+    def touch(self, key):
+        if key in self.models:
+            self.models.move_to_end(key)
+
+    def pin(self, keys):
+        self.pinned = set(keys)
+
+    def set_focus(self, key, index):
+        self.focus[key] = index
+
+    def frame_limit(self, key, share=1):
+        """key 모델이 한도 안에서 가질 수 있는 프레임 수 (프레임 크기를 아직 모르면 None)
+
+        share: 한도를 나눠 쓰는 모델 수. 여유를 조금 남겨서 불러오기와 지우기가 반복되지 않게 한다.
+        """
+        size = self.frame_bytes.get(key)
+        if not size:
+            return None
+        return max(1, int(self.max_bytes * 0.9 / share) // size)
+
+    def put(self, key, index, pixmap):
+        frames = self.models.get(key)
+        # 그 사이에 지워진 모델이거나 이미 있는 프레임
+        if frames is None or frames[index] is not None:
+            return
+
+        frames[index] = pixmap
+        size = pixmap_bytes(pixmap)
+        self.frame_bytes.setdefault(key, size)
+        self.model_bytes[key] += size
+        self.total_bytes += size
+        self.evict()
+
+    def ready_count(self, key) -> int:
+        frames = self.models.get(key)
+        if frames is None:
+            return 0
+        return sum(1 for i in frames if i is not None)
+
+    def is_full(self) -> bool:
+        return self.total_bytes >= self.max_bytes
+
+    def evict(self):
+        for key in list(self.models):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key in self.pinned:
+                continue
+            del self.models[key]
+            self.total_bytes -= self.model_bytes.pop(key)
+            self.frame_bytes.pop(key, None)
+            self.focus.pop(key, None)
+
+        for key in self.pinned:
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key in self.models:
+                self.evict_frames(key)
+
+    def evict_frames(self, key):
+        frames = self.models[key]
+        count = len(frames)
+        focus = self.focus.get(key, 0)
+
+        def distance(i):
+            d = abs(i - focus) % count
+            return min(d, count - d)
+
+        loaded = sorted((i for i, pixmap in enumerate(frames) if pixmap is not None), key=distance, reverse=True)
+        for i in loaded:
+            if self.total_bytes <= self.max_bytes:
+                break
+            size = pixmap_bytes(frames[i])
+            frames[i] = None
+            self.model_bytes[key] -= size
+            self.total_bytes -= size
+
+    def clear(self):
+        self.models.clear()
+        self.model_bytes.clear()
+        self.frame_bytes.clear()
+        self.focus.clear()
+        self.total_bytes = 0
@@ -0,0 +1,232 @@
+"""선언형 제스처 정의와 한 번에 계산하는 판정기
+
+제스처는 랜드마크 사이의 거리(Distance), 손가락 뼈 길이의 합(BoneLength), 관절 각도(Angle)에 대한
+조건(below / above)의 AND로 정의한다. GestureRegistry는 등록된 모든 제스처가 쓰는 값을
+(손 개수, 21, 3) 배열에서 한 번의 NumPy 연산으로 계산하고, 모든 손 x 모든 제스처를 한꺼번에 판정한다.
+GestureTracker는 손마다 이전 상태를 기억해서 히스테리시스(해제 임계값을 느슨하게)와
+디바운스(몇 프레임 연속일 때만 상태 변경)를 적용한다.
+
+    registry = GestureRegistry()
+    registry.register(Gesture("picking", [below(Distance(4, 8), 0.03)], hysteresis=0.2))
+    states = registry.evaluate(world_landmarks)  # (hands, gestures) bool
+"""
+import typing
+import numpy as np
+
+# 손가락별 관절 번호 (뿌리 -> 끝)
+FINGER_JOINTS = (
+    (1, 2, 3, 4),  # thumb
+    (5, 6, 7, 8),  # index
+    (9, 10, 11, 12),  # middle
+    (13, 14, 15, 16),  # ring
+    (17, 18, 19, 20),  # pinky
+)
+FINGER_NAMES = ("thumb", "index", "middle", "ring", "pinky")
+
+
+class Distance(typing.NamedTuple):
+    """두 랜드마크 사이의 거리. dims=2면 xy 평면, 3이면 xyz"""
+    a: int
+    b: int
+    dims: int = 2
+
+
+class BoneLength(typing.NamedTuple):
+    """손가락 뼈 세 개 길이의 합 (xyz)"""
+    finger: int  # 0: thumb ~ 4: pinky
+
+
+class Angle(typing.NamedTuple):
+    """joint에서 a와 c 사이의 각도 (도, 0 ~ 180)"""
+    a: int
+    joint: int
+    c: int
+
+
+class Condition(typing.NamedTuple):
+    feature: typing.Union[Distance, BoneLength, Angle]
+    below: bool  # True: 값 <= threshold, False: 값 >= threshold
+    threshold: float
+
+
+def below(feature, threshold) -> Condition:
+    return Condition(feature, True, threshold)
+
+
+def above(feature, threshold) -> Condition:
+    return Condition(feature, False, threshold)
+
+
+class Gesture:
+    """conditions를 모두 만족하면 켜지는 제스처
+
+    hysteresis: 켜진 뒤에는 임계값을 이 비율만큼 느슨하게 해서 경계에서 깜빡이지 않게 한다.
+    debounce: 판정이 바뀐 뒤 이 프레임 수만큼 더 유지되어야 상태를 바꾼다 (GestureTracker).
+    """
+
+    def __init__(self, name, conditions, hysteresis=0.0, debounce=0):
+        self.name = name
+        self.conditions = list(conditions)
+        self.hysteresis = hysteresis
+        self.debounce = debounce
+
+
+class GestureRegistry:
+    def __init__(self, gestures=()):
+        self.gestures: list[Gesture] = []
+        self.indices: dict[str, int] = {}
+        self.compiled = False
+        for gesture in gestures:
+            self.register(gesture)
+
+    def register(self, gesture: Gesture) -> int:
+        if gesture.name in self.indices:
+            raise ValueError(f"gesture already registered: {gesture.name}")
+        self.indices[gesture.name] = len(self.gestures)
+        self.gestures.append(gesture)
+        self.compiled = False
+        return self.indices[gesture.name]
+
+    def index(self, name) -> int:
+        return self.indices[name]
+
+    @property
+    def names(self) -> list:
+        return [g.name for g in self.gestures]
+
+    ##############################################################################
+
+    def compile(self):
+        """등록된 제스처를 인덱스 배열로 바꾼다 (등록이 바뀐 뒤 처음 판정할 때 한 번)"""
+        features = []
+        for gesture in self.gestures:
+            for condition in gesture.conditions:
+                if condition.feature not in features:
+                    features.append(condition.feature)
+
+        # 모든 값은 "선분 길이의 합" 또는 "각도" 중 하나: 선분마다 한 번만 계산한다
+        segments = {2: [], 3: []}
+        angles = []
+        columns = []  # 값마다 [(종류, 위치)]
+        for feature in features:
+            if isinstance(feature, Distance):
+                pairs, dims = [(feature.a, feature.b)], feature.dims
+            elif isinstance(feature, BoneLength):
+                joints = FINGER_JOINTS[feature.finger]
+                pairs, dims = list(zip(joints[:-1], joints[1:])), 3
+            elif isinstance(feature, Angle):
+                angles.append(feature)
+                columns.append([("angle", len(angles) - 1)])
+                continue
+            else:
+                raise TypeError(f"unknown gesture feature: {feature!r}")
+
+            column = []
+            for pair in pairs:
+                if pair not in segments[dims]:
+                    segments[dims].append(pair)
+                column.append((dims, segments[dims].index(pair)))
+            columns.append(column)
+
+        # 원시 값 [2D 선분, 3D 선분, 각도] -> 값 으로 더하는 행렬
+        offsets = {2: 0, 3: len(segments[2]), "angle": len(segments[2]) + len(segments[3])}
+        mix = np.zeros((offsets["angle"] + len(angles), len(features)), dtype=np.float32)
+        for f, column in enumerate(columns):
+            for kind, i in column:
+                mix[offsets[kind] + i, f] = 1.0
+
+        self.features = features
+        self.seg2 = np.array(segments[2], dtype=np.intp).reshape(-1, 2)
+        self.seg3 = np.array(segments[3], dtype=np.intp).reshape(-1, 2)
+        self.angle_index = np.array(angles, dtype=np.intp).reshape(-1, 3)
+        self.mix = mix
+
+        # 조건: 값 번호, 부호(below: +1, above: -1), 임계값, 켜진 뒤의 임계값
+        conditions = [(g, c) for g, gesture in enumerate(self.gestures) for c in gesture.conditions]
+        self.condition_feature = np.array([features.index(c.feature) for _, c in conditions], dtype=np.intp)
+        self.condition_sign = np.array([1.0 if c.below else -1.0 for _, c in conditions], dtype=np.float32)
+        thresholds = np.array([c.threshold for _, c in conditions], dtype=np.float32)
+        hysteresis = np.array([self.gestures[g].hysteresis for g, _ in conditions], dtype=np.float32)
+        self.enter = self.condition_sign * thresholds
+        self.stay = self.condition_sign * (thresholds + self.condition_sign * np.abs(thresholds) * hysteresis)
+
+        # (조건, 제스처) 소속 행렬: 실패한 조건 수를 한 번의 행렬 곱으로 센다
+        self.membership = np.zeros((len(conditions), len(self.gestures)), dtype=np.int32)
+        for i, (g, _) in enumerate(conditions):
+            self.membership[i, g] = 1
+        self.debounce = np.array([g.debounce for g in self.gestures], dtype=np.int32)
+        self.compiled = True
+
+    def values(self, world_landmarks) -> np.ndarray:
+        """(hands, 21, 3) -> (hands, 값 개수). 손이 없는 칸(NaN)은 NaN"""
+        if not self.compiled:
+            self.compile()
+        w = np.asarray(world_landmarks, dtype=np.float32)
+        raw = []
+        if len(self.seg2):
+            raw.append(np.linalg.norm(w[:, self.seg2[:, 0], :2] - w[:, self.seg2[:, 1], :2], axis=-1))
+        if len(self.seg3):
+            raw.append(np.linalg.norm(w[:, self.seg3[:, 0]] - w[:, self.seg3[:, 1]], axis=-1))
+        if len(self.angle_index):
+            joint = w[:, self.angle_index[:, 1]]
+            v1 = w[:, self.angle_index[:, 0]] - joint
+            v2 = w[:, self.angle_index[:, 2]] - joint
+            cos = np.sum(v1 * v2, axis=-1) / (np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1) + 1e-9)
+            raw.append(np.degrees(np.arccos(np.clip(cos, -1.0, 1.0))))
+        if not raw:
+            return np.zeros((len(w), 0), dtype=np.float32)
+        return np.concatenate(raw, axis=1) @ self.mix
+
+    def evaluate(self, world_landmarks, previous=None) -> np.ndarray:
+        """(hands, 21, 3) -> (hands, gestures) bool
+
+        previous: (hands, gestures) 이전 상태. 켜져 있던 제스처는 hysteresis만큼 느슨한 임계값을 쓴다.
+        """
+        if not self.compiled:
+            self.compile()
+        values = self.values(world_landmarks)[:, self.condition_feature] * self.condition_sign
+        with np.errstate(invalid="ignore"):
+            entered = ((values > self.enter).astype(np.int32) | np.isnan(values)) @ self.membership == 0
+            if previous is None:
+                return entered
+            stayed = ((values > self.stay).astype(np.int32) | np.isnan(values)) @ self.membership == 0
+        return np.where(previous, stayed, entered)
+
+
+class GestureTracker:
+    """손(slot)마다 제스처 상태를 기억해서 히스테리시스와 디바운스를 적용한다
+
+    slots: 손을 구분하는 번호. 주지 않으면 인식된 순서(0, 1, ...)를 쓴다.
+    이번 프레임에 없는 손의 상태는 꺼진다.
+    """
+
+    def __init__(self, registry: GestureRegistry, max_slots=4):
+        self.registry = registry
+        self.max_slots = max_slots
+        self.reset()
+
+    def reset(self):
+        n = len(self.registry.gestures)
+        self.active = np.zeros((self.max_slots, n), dtype=bool)
+        self.pending = np.zeros((self.max_slots, n), dtype=np.int32)
+
+    def update(self, world_landmarks, slots=None) -> np.ndarray:
+        """(hands, gestures) bool: 손마다 디바운스까지 적용된 상태"""
+        if self.active.shape[1] != len(self.registry.gestures):
+            self.reset()
+        slots = np.arange(len(world_landmarks)) if slots is None else np.asarray(slots, dtype=np.intp)
+
+        missing = np.ones(self.max_slots, dtype=bool)
+        missing[slots] = False
+        self.active[missing] = False
+        self.pending[missing] = 0
+
+        previous = self.active[slots]
+        raw = self.registry.evaluate(world_landmarks, previous)
+        changed = raw != previous
+        pending = np.where(changed, self.pending[slots] + 1, 0)
+        flip = changed & (pending > self.registry.debounce)
+
+        self.active[slots] = np.where(flip, raw, previous)
+        self.pending[slots] = np.where(flip, 0, pending)
+        return self.active[slots]
@@ -1,10 +1,27 @@
 import cv2
 import numpy as np
-import typing
+import time
+
+import gestures
+import hand_overlay
 
 FINGER_CLOSE_THRESHOLD = 0.06
 PICKING_GESTURE_THRESHOLD = 0.03
 STABLE_RADIUS = 0.01
+# 제스처 해제 임계값 여유 비율 (GestureTracker에서 켜진 뒤에만 적용)
+GESTURE_HYSTERESIS = 0.15
+
+# ROI 추적: 잘라낸 영역의 최대 한 변 길이(px), 손 크기 대비 영역 배율, 전체 화면 재탐지 주기
+ROI_SIZE = 256
+ROI_MARGIN = 1.8
+ROI_REDETECT_INTERVAL = 30
+
+# 움직임 게이트: 축소 흑백 프레임의 평균 밝기 차이(0~255), 결과 재사용 최대 시간(초),
+# 손이 안 보인 뒤 대기 모드로 들어가는 시간(초), 대기 모드의 인식 주기(초)
+MOTION_THRESHOLD = 3.0
+MOTION_MAX_REUSE = 0.5
+IDLE_AFTER = 5.0
+IDLE_INTERVAL = 1.0
 
 class Stabilizer:
     singleton = None
@@ -34,9 +51,201 @@ class Stabilizer:
             self.prev_vec = vec
             return x, y
         
+class MotionGate:
+    """화면이 거의 바뀌지 않았으면 인식을 건너뛰고 이전 결과를 재사용하게 하는 게이트
+
+    프레임을 작은 흑백 이미지로 줄여 마지막으로 인식한 프레임과 비교한다.
+    손이 IDLE_AFTER초 동안 보이지 않으면 대기 모드로 바뀌어 IDLE_INTERVAL초에 한 번만 인식한다.
+    """
+
+    def __init__(self, threshold=MOTION_THRESHOLD, max_reuse_age=MOTION_MAX_REUSE,
+                 idle_after=IDLE_AFTER, idle_interval=IDLE_INTERVAL, size=(32, 24)):
+        self.threshold = threshold
+        self.max_reuse_age = max_reuse_age
+        self.idle_after = idle_after
+        self.idle_interval = idle_interval
+        self.size = size
+
+        self.reference = None  # 마지막으로 인식한 프레임의 축소 이미지
+        self.last_inference = 0.0
+        self.last_hand_seen = time.monotonic()
+        self.idle = False
+        self.motion = 0.0
+
+        # 통계
+        self.inferred = 0
+        self.skipped = 0
+
+    def thumbnail(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_RGB2GRAY).astype(np.int16)
+
+    def should_infer(self, frame, now=None) -> bool:
+        now = time.monotonic() if now is None else now
+        thumb = self.thumbnail(frame)
+        age = now - self.last_inference
+
+        if self.reference is None:
+            self.motion = float("inf")
+        else:
+            self.motion = float(np.mean(np.abs(thumb - self.reference)))
+        moved = self.motion > self.threshold
+
+        if self.idle:
+            infer = moved and age >= self.idle_interval
+        else:
+            infer = moved or age >= self.max_reuse_age
+
+        if infer:
+            self.reference = thumb
+            self.last_inference = now
+            self.inferred += 1
+        else:
+            self.skipped += 1
+        return infer
+
+    def update(self, hand_found, now=None):
+        """인식 결과가 나올 때마다 호출해서 대기 모드를 갱신한다."""
+        now = time.monotonic() if now is None else now
+        if hand_found:
+            self.last_hand_seen = now
+        self.idle = now - self.last_hand_seen >= self.idle_after
+
+
+class RoiTracker:
+    """이전 프레임의 손 위치 주변만 잘라서 인식하는 추적기
+
+    잘라낸 영역은 ROI_SIZE 이하로 축소해서 모델에 넣고, 결과 좌표는 다시
+    전체 프레임 기준의 정규화 좌표로 바꿔 놓는다. 손을 놓치면 같은 프레임을
+    전체 화면으로 다시 인식하고, 새 손이 들어오는 것을 놓치지 않도록
+    ROI_REDETECT_INTERVAL 프레임마다 한 번은 전체 화면을 사용한다.
+    """
+
+    def __init__(self, roi_size=ROI_SIZE, margin=ROI_MARGIN, redetect_interval=ROI_REDETECT_INTERVAL):
+        self.roi_size = roi_size
+        self.margin = margin
+        self.redetect_interval = redetect_interval
+
+        self.roi = None  # (x0, y0, x1, y1) 픽셀 좌표
+        self.frames_since_full = 0
+
+        # 통계
+        self.roi_count = 0
+        self.full_count = 0
+
+    def process(self, model, frame):
+        h, w = frame.shape[:2]
+
+        if self.roi is not None and self.frames_since_full < self.redetect_interval:
+            self.frames_since_full += 1
+            x0, y0, x1, y1 = self.roi
+            crop = frame[y0:y1, x0:x1]
+            scale = self.roi_size / max(x1 - x0, y1 - y0)
+            if scale < 1:
+                crop = cv2.resize(crop, (round((x1 - x0) * scale), round((y1 - y0) * scale)), interpolation=cv2.INTER_AREA)
+            else:
+                crop = np.ascontiguousarray(crop)
+
+            results = model.process(crop)
+            if results.multi_hand_landmarks:
+                self.remap(results, x0, y0, x1 - x0, y1 - y0, w, h)
+                self.update_roi(results, w, h)
+                self.roi_count += 1
+                return results
+
+        # 손을 놓쳤거나 재탐지 주기이면 전체 화면에서 찾는다
+        results = model.process(frame)
+        self.frames_since_full = 0
+        self.full_count += 1
+        if results.multi_hand_landmarks:
+            self.update_roi(results, w, h)
+        else:
+            self.roi = None
+        return results
+
+    @staticmethod
+    def remap(results, x0, y0, cw, ch, w, h):
+        # 잘라낸 영역 기준 정규화 좌표 -> 전체 프레임 기준 정규화 좌표
+        for handLms in results.multi_hand_landmarks:
+            for lm in handLms.landmark:
+                lm.x = (x0 + lm.x * cw) / w
+                lm.y = (y0 + lm.y * ch) / h
+                lm.z = lm.z * cw / w
+
+    def update_roi(self, results, w, h):
+        xs = [lm.x * w for handLms in results.multi_hand_landmarks for lm in handLms.landmark]
+        ys = [lm.y * h for handLms in results.multi_hand_landmarks for lm in handLms.landmark]
+        bx0, by0, bx1, by1 = min(xs), min(ys), max(xs), max(ys)
+
+        # 손이 지금 영역의 안쪽에 있으면 영역을 움직이지 않는다 (모델 내부 추적이 끊기지 않도록)
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            pad = (x1 - x0) * 0.1
+            if bx0 >= x0 + pad and by0 >= y0 + pad and bx1 <= x1 - pad and by1 <= y1 - pad:
+                return
+
+        side = min(max(bx1 - bx0, by1 - by0, 32) * self.margin, w, h)
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        x0 = int(min(max(cx - side / 2, 0), w - side))
+        y0 = int(min(max(cy - side / 2, 0), h - side))
+        self.roi = (x0, y0, x0 + int(side), y0 + int(side))
+
+
+# 손가락별 끝 관절 번호 (thumb, index, middle, ring, pinky)
+FINGER_TIPS = np.array([4, 8, 12, 16, 20])
+
+
+def results_to_arrays(results):
+    """MediaPipe 결과를 (손 개수, 21, 3) float32 배열과 handedness 목록으로 바꾼다."""
+    def to_array(hands):
+        if not hands:
+            return np.zeros((0, 21, 3), dtype=np.float32)
+        return np.array(
+            [[(lm.x, lm.y, lm.z) for lm in handLms.landmark] for handLms in hands],
+            dtype=np.float32
+        )
+
+    handedness = [
+        (c.classification[0].label, c.classification[0].score)
+        for c in (results.multi_handedness or [])
+    ]
+    return to_array(results.multi_hand_landmarks), to_array(results.multi_hand_world_landmarks), handedness
+
+
+def finger_extents(world_landmarks):
+    """(hands, 21, 3) -> (hands, 5): 손가락 뿌리에서 끝까지의 xy 거리
+
+    뼈 3개 벡터의 합은 (끝 - 뿌리) 이므로 관절 두 개만 보면 된다."""
+    d = world_landmarks[:, FINGER_TIPS, :2] - world_landmarks[:, FINGER_TIPS - 3, :2]
+    return np.linalg.norm(d, axis=-1)
+
+
+def picking_distances(world_landmarks):
+    """(hands, 21, 3) -> (hands,): 엄지 끝과 검지 끝 사이의 xy 거리"""
+    return np.linalg.norm(world_landmarks[:, 4, :2] - world_landmarks[:, 8, :2], axis=-1)
+
+
+def default_gestures() -> gestures.GestureRegistry:
+    """기존 제스처: 손가락별 접힘(<이름>_close), 엄지 빼고 전부 접힘(all_close), 집기(picking)"""
+    folded = [gestures.below(gestures.Distance(tip, tip - 3), FINGER_CLOSE_THRESHOLD) for tip in FINGER_TIPS.tolist()]
+    registry = gestures.GestureRegistry()
+    for name, condition in zip(gestures.FINGER_NAMES, folded):
+        registry.register(gestures.Gesture(f"{name}_close", [condition], GESTURE_HYSTERESIS))
+    registry.register(gestures.Gesture("all_close", folded[1:], GESTURE_HYSTERESIS))
+    registry.register(gestures.Gesture(
+        "picking", [gestures.below(gestures.Distance(4, 8), PICKING_GESTURE_THRESHOLD)], GESTURE_HYSTERESIS
+    ))
+    return registry
+
+
+GESTURES = default_gestures()
+DEBUG_OVERLAY = hand_overlay.HandOverlay()
+
+
 class HandRecog:
-    def __init__(self, model, mp_draw, mp_hands, frame, stabilization=False):
-        """frame: image(MatLike) read from cap.read()"""
+    def __init__(self, model, mp_draw, mp_hands, frame, stabilization=False, tracker=None):
+        """frame: image(MatLike) read from cap.read()
+        tracker: RoiTracker를 주면 이전 손 위치 주변만 잘라서 인식한다."""
         
         self.frame = frame
         self.mp_draw = mp_draw
@@ -47,97 +256,68 @@ class HandRecog:
         else:
             self.stabilizer = None
 
-        if frame is not None:
-            self.results = model.process(frame)
-        else:
+        self.gesture_states = None
+
+        if model is None:
+            # fromArrays()에서 채운다
+            return
+        if frame is None:
             raise TypeError("카메라가 존재하지 않습니다.")
-        
-        self.hands: typing.NamedTuple = self.results.multi_hand_landmarks
+
+        if tracker is not None:
+            results = tracker.process(model, frame)
+        else:
+            results = model.process(frame)
+
+        # 프레임마다 한 번만 배열로 바꾸고, 이후의 계산은 모두 배열로 한다
+        self.landmarks, self.world_landmarks, self.handedness = results_to_arrays(results)
+
+    @classmethod
+    def fromArrays(cls, landmarks, world_landmarks, handedness, mp_draw=None, mp_hands=None, frame=None, stabilization=False):
+        """다른 프로세스에서 이미 계산한 (hands, 21, 3) 배열을 복사 없이 그대로 사용한다."""
+        recog = cls(None, mp_draw, mp_hands, frame, stabilization)
+        recog.landmarks = landmarks
+        recog.world_landmarks = world_landmarks
+        recog.handedness = handedness
+        return recog
         
     def handExists(self):
-        if self.hands:
-            return True
-        return False
+        return len(self.landmarks) > 0
 
     def drawHandPoint(self):
-        if self.hands:
-            # 각 손에 대한 반복
-            for handLms in self.hands:
-                print(self.frame.shape)
-                for id, lm in enumerate(handLms.landmark):
-                    h, w, c = self.frame.shape
-                    cx, cy = int(lm.x * w), int(lm.y * h)
-
-                    # 지점마다 원을 그람
-                    cv2.circle(self.frame, (cx, cy), 5, (255, 0, 255), cv2.FILLED)
-                    
-                # 점마다 라인을 연결
-                self.mp_draw.draw_landmarks(self.frame, handLms, self.mp_hands.HAND_CONNECTIONS)
+        if self.handExists():
+            DEBUG_OVERLAY.draw(self.frame, self.landmarks)
 
         return self.frame
-    
-    # finger_n: number of finger (thumb: 1, index: 2, middle: 3 ...)
-    def isFingerClose(self, finger_n: int):
-        if self.results.multi_hand_world_landmarks:
-            # 여러 손이 인식되면 그 중 하나만
-            handLms = self.results.multi_hand_world_landmarks[0]
-            fingers = handLms.landmark  # index 0 - 20
-            
-            # n번째 손가락 끝의 번호 : n * 4
-            tip_idx = finger_n * 4
-            # 손가락 뼈 3개를 벡터로 나타냄
-            bone1 = np.array([
-                fingers[tip_idx - 2].x - fingers[tip_idx - 3].x,
-                fingers[tip_idx - 2].y - fingers[tip_idx - 3].y
-            ])
-            bone2 = np.array([
-                fingers[tip_idx - 1].x - fingers[tip_idx - 2].x,
-                fingers[tip_idx - 1].y - fingers[tip_idx - 2].y
-            ])
-            bone3 = np.array([
-                fingers[tip_idx].x - fingers[tip_idx - 1].x,
-                fingers[tip_idx].y - fingers[tip_idx - 1].y
-            ])
-            d = np.linalg.norm(bone1 + bone2 + bone3)
-            if d <= FINGER_CLOSE_THRESHOLD:
-                return True
-            else:
-                return False
 
+    def gestureStates(self) -> np.ndarray:
+        """(hands, len(GESTURES)) bool: 모든 손의 모든 제스처를 한 번에 판정 (프레임마다 한 번)"""
+        if self.gesture_states is None:
+            self.gesture_states = GESTURES.evaluate(self.world_landmarks)
+        return self.gesture_states
+
+    def gesture(self, name, hand=0) -> bool:
+        states = self.gestureStates()
+        if hand < len(states):
+            return bool(states[hand, GESTURES.index(name)])
         return False
+
+    # finger_n: number of finger (thumb: 1, index: 2, middle: 3 ...)
+    def isFingerClose(self, finger_n: int):
+        # 여러 손이 인식되면 그 중 하나만
+        return self.gesture(f"{gestures.FINGER_NAMES[finger_n - 1]}_close")
     
     def isAllClose(self):
         # 엄지 빼고 전부
-        for i in (2, 3, 4, 5):
-            if not self.isFingerClose(i):
-                return False
-        return True
+        return self.gesture("all_close")
     
     def isPickingGesture(self):
-        if self.results.multi_hand_world_landmarks:
-            # 여러 손이 인식되면 그 중 하나만
-            handLms = self.results.multi_hand_world_landmarks[0]
-            fingers = handLms.landmark  # index 0 - 20
-            
-            thumb_tip = np.array([fingers[4].x, fingers[4].y])
-            index_tip = np.array([fingers[8].x, fingers[8].y])
-            
-            d = np.linalg.norm(thumb_tip - index_tip)
-            if d <= PICKING_GESTURE_THRESHOLD:
-                return True
-            else:
-                return False
-
-        return False
+        return self.gesture("picking")
     
-    def getPointFromIdx(self, idx: int) -> tuple[float, float]:
-        if self.hands:
-            # 여러 손이 인식되면 그 중 하나만
-            handLms = self.hands[0]
-            fingers = handLms.landmark  # index 0 - 20
-            point = fingers[idx]
-            x, y = point.x, point.y
-            
+    def getPointFromIdx(self, idx: int, hand=0) -> tuple[float, float]:
+        if hand < len(self.landmarks):
+            # 여러 손이 인식되면 hand번째 손만
+            x, y = self.landmarks[hand, idx, :2].tolist()
             return x, y
         
         # 손이 없으면 항상 중간점
@@ -0,0 +1,69 @@
+"""손 랜드마크 디버그 오버레이
+
+모든 손의 랜드마크를 한 번의 배열 연산으로 픽셀 좌표로 바꾸고,
+점과 연결선을 각각 cv2.polylines 한 번으로 그린다.
+(길이가 0인 선분을 두께 2r로 그리면 cv2.circle(r, FILLED)와 같은 픽셀이 찍힌다.)
+미리보기(picture-in-picture)용 이미지는 매번 같은 버퍼에 그려 할당을 반복하지 않는다.
+mediapipe를 import하지 않아도 되도록 손 연결 정보를 직접 가지고 있다.
+"""
+import cv2
+import numpy as np
+
+# mediapipe.solutions.hands.HAND_CONNECTIONS와 같은 연결
+HAND_CONNECTIONS = (
+    (0, 1), (1, 2), (2, 3), (3, 4),  # thumb
+    (0, 5), (5, 6), (6, 7), (7, 8),  # index
+    (5, 9), (9, 10), (10, 11), (11, 12),  # middle
+    (9, 13), (13, 14), (14, 15), (15, 16),  # ring
+    (13, 17), (0, 17), (17, 18), (18, 19), (19, 20),  # pinky
+)
+
+POINT_RADIUS = 5
+POINT_COLOR = (255, 0, 255)
+LINE_COLOR = (255, 255, 255)
+LINE_THICKNESS = 2
+
+
+def project(landmarks, width, height) -> np.ndarray:
+    """(hands, 21, 3) 정규화 좌표 -> (hands, 21, 2) int32 픽셀 좌표"""
+    return (np.asarray(landmarks)[..., :2] * (width, height)).astype(np.int32)
+
+
+class HandOverlay:
+    def __init__(self, point_radius=POINT_RADIUS, point_color=POINT_COLOR,
+                 line_color=LINE_COLOR, line_thickness=LINE_THICKNESS):
+        self.connections = np.array(HAND_CONNECTIONS, dtype=np.intp)
+        self.dots = np.repeat(np.arange(21), 2).reshape(21, 2)  # 점마다 (i, i) 선분
+        self.point_thickness = 2 * point_radius
+        self.point_color = point_color
+        self.line_color = line_color
+        self.line_thickness = line_thickness
+        self.buffer = None
+
+    def draw(self, image, landmarks):
+        """image 위에 바로 그린다 (uint8, 채널 순서는 색상 값과 같은 순서로 해석)"""
+        if len(landmarks) == 0:
+            return image
+        h, w = image.shape[:2]
+        points = project(landmarks, w, h)
+
+        # 점: 모든 손의 모든 점을 한 번에
+        dots = points[:, self.dots].reshape(-1, 2, 2)
+        cv2.polylines(image, list(dots), False, self.point_color, self.point_thickness)
+
+        # 연결선: 모든 손의 모든 선분을 한 번에
+        segments = points[:, self.connections].reshape(-1, 2, 2)
+        cv2.polylines(image, list(segments), False, self.line_color, self.line_thickness)
+        return image
+
+    def render(self, frame, landmarks, size=None) -> np.ndarray:
+        """frame을 size(w, h)로 줄인 복사본에 그린다. 돌려주는 배열은 다음 호출 때 다시 쓰인다."""
+        w, h = size or (frame.shape[1], frame.shape[0])
+        shape = (h, w) + frame.shape[2:]
+        if self.buffer is None or self.buffer.shape != shape:
+            self.buffer = np.empty(shape, dtype=frame.dtype)
+        if frame.shape == shape:
+            np.copyto(self.buffer, frame)
+        else:
+            cv2.resize(frame, (w, h), dst=self.buffer, interpolation=cv2.INTER_AREA)
+        return self.draw(self.buffer, landmarks)
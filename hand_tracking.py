@@ -0,0 +1,152 @@
+"""프레임이 바뀌어도 같은 손에 같은 번호를 붙이는 추적기
+
+MediaPipe가 돌려주는 손의 순서는 프레임마다 바뀔 수 있다.
+HandTracker는 손바닥 중심의 위치와 handedness(Left/Right)로 이전 프레임의 손과 짝을 지어
+손마다 고정된 칸(slot)과 번호(id)를 붙인다. 칸 번호는 GestureTracker의 slots로 그대로 쓴다.
+HandControl은 인식 결과마다 모든 손의 번호, 제스처, 방향을 한 번에 계산해서
+회전과 모델 전환에 나눠 쓴다 (main.py의 화면과 benchmark.py가 같이 쓴다).
+"""
+import numpy as np
+
+import gestures
+import hand
+import rotation
+
+# 손바닥 중심을 구할 때 쓰는 관절 (손목, 각 손가락 뿌리)
+PALM = [0, 5, 9, 13, 17]
+
+# 같은 손으로 볼 최대 이동 거리 (정규화 좌표), handedness가 다를 때 더하는 거리,
+# 이 시간(초) 동안 보이지 않으면 다른 손으로 본다
+MAX_DISTANCE = 0.2
+HANDEDNESS_PENALTY = 0.1
+MAX_MISSING = 0.5
+# 주먹으로 모델을 바꾼 뒤, 또는 회전을 놓은 뒤 다음 전환까지 기다리는 시간 (초)
+MODEL_SWITCH_COOLDOWN = 1.0
+
+
+class HandTracker:
+    def __init__(self, max_slots=4, max_distance=MAX_DISTANCE, handedness_penalty=HANDEDNESS_PENALTY,
+                 max_missing=MAX_MISSING):
+        self.max_slots = max_slots
+        self.max_distance = max_distance
+        self.handedness_penalty = handedness_penalty
+        self.max_missing = max_missing
+
+        self.centers = np.zeros((max_slots, 2), dtype=np.float32)
+        self.labels = [None] * max_slots
+        self.last_seen = np.zeros(max_slots)
+        self.ids = np.full(max_slots, -1)  # -1: 빈 칸
+        self.next_id = 0
+
+    @property
+    def alive(self) -> np.ndarray:
+        return self.ids >= 0
+
+    def update(self, landmarks, handedness, now) -> np.ndarray:
+        """(hands, 21, 3), [(label, score), ...] -> 손마다 칸 번호 (hands,). 칸이 모자라면 -1"""
+        self.ids[self.alive & (now - self.last_seen > self.max_missing)] = -1
+
+        n = len(landmarks)
+        slots = np.full(n, -1, dtype=np.intp)
+        if n == 0:
+            return slots
+
+        # 모든 손 x 모든 칸의 거리를 한 번에 계산
+        centers = landmarks[:, PALM, :2].mean(axis=1)
+        cost = np.linalg.norm(centers[:, None] - self.centers[None], axis=-1)
+        labels = [i[0] for i in handedness] + [None] * (n - len(handedness))
+        for d, label in enumerate(labels):
+            for s, known in enumerate(self.labels):
+                if label is not None and known is not None and label != known:
+                    cost[d, s] += self.handedness_penalty
+        cost[:, ~self.alive] = np.inf
+        cost[cost > self.max_distance] = np.inf
+
+        # 가장 가까운 쌍부터 짝을 짓는다
+        taken = np.zeros(self.max_slots, dtype=bool)
+        for flat in np.argsort(cost, axis=None):
+            d, s = divmod(int(flat), self.max_slots)
+            if not np.isfinite(cost[d, s]):
+                break
+            if slots[d] < 0 and not taken[s]:
+                slots[d] = s
+                taken[s] = True
+
+        # 짝이 없는 손은 빈 칸에 새 번호로
+        free = iter(np.flatnonzero(~self.alive & ~taken).tolist())
+        for d in np.flatnonzero(slots < 0):
+            s = next(free, None)
+            if s is None:
+                break
+            slots[d] = s
+            self.ids[s] = self.next_id
+            self.next_id += 1
+
+        found = slots >= 0
+        self.centers[slots[found]] = centers[found]
+        self.last_seen[slots[found]] = now
+        for d in np.flatnonzero(found):
+            self.labels[slots[d]] = labels[d]
+        return slots
+
+
+class HandControl:
+    """회전은 집고 있는 손 하나가 맡고, 회전을 맡지 않은 손이 주먹을 새로 쥐면 모델을 바꾼다
+
+    update()는 새 인식 결과가 있을 때마다 호출한다.
+    """
+
+    def __init__(self, rotation_controller: rotation.RotationController, registry=None,
+                 cooldown=MODEL_SWITCH_COOLDOWN):
+        registry = hand.GESTURES if registry is None else registry
+        self.rotation = rotation_controller
+        self.cooldown = cooldown
+        # 손마다 고정된 번호를 붙이고, 그 번호별로 제스처 상태를 기억해서
+        # 인식 순서가 바뀌거나 경계에서 제스처가 깜빡여도 같은 손의 상태가 유지되게 한다
+        self.hands = HandTracker()
+        self.gestures = gestures.GestureTracker(registry, max_slots=self.hands.max_slots)
+        self.picking_index = registry.index("picking")
+        self.fist_index = registry.index("all_close")
+
+        self.count = 0  # 이번 결과의 손 개수
+        self.owner = None  # 회전을 맡은 손 번호
+        self.fist_ids = set()  # 지금 주먹을 쥐고 있는 손 번호
+        self.released = {}  # 회전을 놓은 손 번호 -> 놓은 시각
+        self.last_model_switch = 0.0
+
+    def update(self, landmarks, world_landmarks, handedness, timestamp) -> bool:
+        """(hands, 21, 3) 두 개와 handedness, 캡처 시각 -> 모델을 바꿔야 하면 True"""
+        slots = self.hands.update(landmarks, handedness, timestamp)
+        tracked = slots >= 0
+        slots = slots[tracked]
+        ids = self.hands.ids[slots]
+        states = self.gestures.update(world_landmarks[tracked], slots)
+        directions = rotation.hand_directions(landmarks[tracked])
+        picking = states[:, self.picking_index]
+        self.count = len(ids)
+
+        # 계속 집고 있으면 그 손이 회전을 유지하고,
+        # 놓으면 집고 있는 다른 손 중 가장 먼저 나타난 손이 이어받는다
+        owner = self.owner
+        if owner not in ids[picking]:
+            owner = int(ids[picking].min()) if picking.any() else None
+            if owner != self.owner and self.rotation.active:
+                # 이어받은 손의 방향을 새 기준으로 잡는다 (손 사이의 각도만큼 튀지 않게)
+                self.rotation.update(None, timestamp)
+            if self.owner is not None:
+                self.released[self.owner] = timestamp
+            self.owner = owner
+        vector = None if owner is None else directions[ids == owner][0]
+        self.rotation.update(vector, timestamp)
+
+        # 대기 시간 안에 집기를 놓은 손은 나머지 손가락이 말려 있어도 새로 쥔 것으로 보지 않고,
+        # 그대로 쥐고 있으면 대기 시간이 지나도 펴었다 다시 쥐기 전까지는 전환하지 않는다
+        self.released = {i: t for i, t in self.released.items() if timestamp - t < self.cooldown}
+        fist = states[:, self.fist_index] & ~picking & (ids != owner)
+        fist_ids = set(ids[fist].tolist())
+        started = fist_ids - self.fist_ids - set(self.released)
+        self.fist_ids = fist_ids
+        if started and timestamp - self.last_model_switch >= self.cooldown:
+            self.last_model_switch = timestamp
+            return True
+        return False
@@ -0,0 +1,198 @@
+"""MediaPipe 손 인식을 별도 프로세스에서 실행한다
+
+프레임은 multiprocessing.shared_memory로 넘기고(큰 배열을 pickle하지 않음),
+결과는 (손 개수, 21, 3) 크기의 작은 배열로 큐를 통해 돌려받는다.
+한 번에 하나의 프레임만 처리하므로 처리 중에는 공유 메모리를 덮어쓰지 않는다.
+
+mediapipe import와 첫 process() 호출(그래프 초기화)은 시간이 오래 걸리므로
+작업 프로세스가 시작하자마자 빈 프레임으로 미리 한 번 돌려 두고 WorkerReady를 보낸다.
+Reconfigure를 받으면 같은 방법으로 모델을 다시 만들고 WorkerReady를 다시 보낸다.
+"""
+from multiprocessing import shared_memory
+import multiprocessing
+import queue
+import time
+import typing
+import numpy as np
+
+import hand
+
+DEFAULT_HANDS_CONFIG = {
+    "static_image_mode": False,
+    "min_detection_confidence": 0.4,
+    "min_tracking_confidence": 0.4,
+    "max_num_hands": 2,
+}
+
+
+# 시작할 때 모델을 미리 돌려 볼 빈 프레임 크기 (h, w, 3)
+WARMUP_SHAPE = (240, 320, 3)
+
+
+class WorkerReady(typing.NamedTuple):
+    import_seconds: float  # mediapipe import
+    warmup_seconds: float  # Hands 생성 + 첫 process()
+
+
+class Reconfigure(typing.NamedTuple):
+    hands_config: dict  # 이 설정으로 Hands를 다시 만든다 (끝나면 WorkerReady를 다시 보냄)
+
+
+class InferenceResult(typing.NamedTuple):
+    seq: int
+    timestamp: float  # 프레임을 캡처한 시각
+    landmarks: np.ndarray  # (hands, 21, 3) float32, 정규화된 이미지 좌표
+    world_landmarks: np.ndarray  # (hands, 21, 3) float32, 미터 단위
+    handedness: list  # [(label, score), ...]
+    inference_seconds: float = 0.0  # 작업 프로세스에서 인식에 걸린 시간
+
+
+def open_model(mp, hands_config):
+    """Hands를 만들고 빈 프레임으로 한 번 돌린다: (model, 걸린 시간)"""
+    start = time.perf_counter()
+    model = mp.solutions.hands.Hands(**hands_config)
+    model.process(np.zeros(WARMUP_SHAPE, dtype=np.uint8))
+    return model, time.perf_counter() - start
+
+
+def worker_main(requests, results, hands_config, tracking):
+    start = time.perf_counter()
+    import mediapipe as mp
+    imported = time.perf_counter()
+
+    tracker = hand.RoiTracker() if tracking else None
+    shm = None
+    last_shape = None
+    model, warmup = open_model(mp, hands_config)
+    results.put(WorkerReady(imported - start, warmup))
+    try:
+        while True:
+            msg = requests.get()
+            if msg is None:
+                break
+
+            if isinstance(msg, Reconfigure):
+                model.close()
+                model, warmup = open_model(mp, msg.hands_config)
+                tracker = hand.RoiTracker() if tracking else None
+                results.put(WorkerReady(0.0, warmup))
+                continue
+
+            seq, timestamp, name, shape = msg
+            if tracker is not None and tracker.roi is not None and shape != last_shape:
+                # 프레임 크기가 바뀌면 픽셀 좌표로 기억한 영역이 맞지 않으므로 전체 화면부터 다시 찾는다
+                tracker.roi = None
+            last_shape = shape
+            if shm is None or shm.name != name:
+                # 크기가 바뀌면 메인 프로세스가 새 블록을 만든다. 한 번에 한 프레임만 처리하므로
+                # 이전 블록은 더 쓰이지 않는다 (spawn으로 만든 프로세스는 메인 프로세스의 resource tracker를 같이 씀)
+                if shm is not None:
+                    shm.close()
+                shm = shared_memory.SharedMemory(name=name)
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+
+            started = time.perf_counter()
+            if tracker is not None:
+                raw = tracker.process(model, frame)
+            else:
+                raw = model.process(frame)
+            landmarks, world_landmarks, handedness = hand.results_to_arrays(raw)
+            del frame
+            results.put(InferenceResult(seq, timestamp, landmarks, world_landmarks, handedness,
+                                        time.perf_counter() - started))
+    finally:
+        model.close()
+        if shm is not None:
+            shm.close()
+
+
+class InferenceWorker:
+    """손 인식 프로세스를 관리한다
+
+    submit()은 작업자가 준비를 마쳤고 놀고 있을 때만 프레임을 공유 메모리에 복사해 넘기고,
+    poll()은 기다리지 않고 가장 최근 결과를 돌려준다.
+    """
+
+    def __init__(self, hands_config=None, tracking=False):
+        """tracking: 이전 손 위치 주변만 잘라서 인식 (hand.RoiTracker)"""
+        self.hands_config = dict(DEFAULT_HANDS_CONFIG if hands_config is None else hands_config)
+
+        # Qt가 초기화된 프로세스를 fork하지 않도록 spawn을 사용
+        ctx = multiprocessing.get_context("spawn")
+        self.requests = ctx.Queue()
+        self.results = ctx.Queue()
+        self.process = ctx.Process(
+            target=worker_main, args=(self.requests, self.results, self.hands_config, tracking),
+            name="hand-inference", daemon=True
+        )
+        self.process.start()
+
+        self.shm = None
+        self.shm_frame = None
+        self.busy = False
+        self.latest = None
+
+        # 모델 준비(WorkerReady)를 받기 전에는 프레임을 받지 않는다
+        self.ready = False
+        self.ready_time = None  # time.monotonic()
+        self.ready_info = None
+
+    def prepare(self, shape):
+        if self.shm_frame is not None and self.shm_frame.shape == shape:
+            return
+        # 작업 중인 프레임이 없을 때만 호출되므로 바로 바꿔도 된다
+        self.release()
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+        self.shm_frame = np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    def submit(self, frame, seq, timestamp=0.0) -> bool:
+        if self.busy or not self.ready:
+            return False
+        self.prepare(frame.shape)
+        np.copyto(self.shm_frame, frame)
+        self.requests.put((seq, timestamp, self.shm.name, frame.shape))
+        self.busy = True
+        return True
+
+    def reconfigure(self, hands_config):
+        """Hands 설정을 바꾼다. 작업자가 모델을 다시 준비하는 동안(WorkerReady 전까지) 프레임을 받지 않는다."""
+        self.hands_config = dict(hands_config)
+        self.requests.put(Reconfigure(self.hands_config))
+        self.ready = False
+
+    def poll(self) -> typing.Optional[InferenceResult]:
+        """새 결과가 있으면 가장 최근 것을, 없으면 None을 돌려준다."""
+        newest = None
+        while True:
+            try:
+                msg = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(msg, WorkerReady):
+                self.ready = True
+                self.ready_time = time.monotonic()
+                self.ready_info = msg
+                continue
+            newest = msg
+            self.busy = False
+
+        if newest is not None:
+            self.latest = newest
+        elif (self.busy or not self.ready) and not self.process.is_alive():
+            raise RuntimeError("hand inference process exited.")
+        return newest
+
+    def release(self):
+        if self.shm is not None:
+            self.shm_frame = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        if self.process.is_alive():
+            self.requests.put(None)
+            self.process.join(timeout=2.0)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.release()
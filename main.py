@@ -1,116 +1,269 @@
+import time
+# 시작 시간 기록 (startup 로그의 기준, 다른 import보다 먼저)
+START_TIME = time.monotonic()
+
 from PyQt5.QtWidgets import QApplication
 from PyQt5 import QtGui
+from PyQt5.QtCore import Qt
 import sys
-import mediapipe as mp
-import numpy as np
 import os
 
+import cv2
+
 import camera_load
 import ui
 import hand
+import hand_worker
+import rotation
+import hand_overlay
+import hand_tracking
+import qos
 
 # wtf: ????????????????????????????????????????????????????????
 if sys.platform != "win32":
-    os.environ.pop("QT_QPA_PLATFORM_PLUGIN_PATH")
+    os.environ.pop("QT_QPA_PLATFORM_PLUGIN_PATH", None)
 
 # 0 or 1
 ROTATION_DIRECTION = 1
 
-def cmdClear():
-    if sys.platform == "win32":
-        os.system("cls")
-    else:
-        os.system("clear")
-
-
-# 기준 벡터 (0, 1) (y축 단위 벡터)
-reference_vector = np.array([0, -1])
-def delta_angle(a):
-    global reference_vector
-    # 벡터 크기 (norm)
-    norm_reference = np.linalg.norm(reference_vector)
-    norm_a = np.linalg.norm(a)
-    
-    # 두 벡터의 내적
-    dot_product = np.dot(reference_vector, a)
-    
-    # 각도 (라디안 단위)
-    cos_theta = dot_product / (norm_reference * norm_a)
-    theta_radians = np.arccos(cos_theta)
-    
-    # 외적을 사용하여 회전 방향을 확인
-    cross_product = np.cross(reference_vector, a)
-    
-    # 방향 판별
-    if (cross_product < 0 and not ROTATION_DIRECTION) or (cross_product > 0 and ROTATION_DIRECTION):
-        angle_degrees = np.degrees(theta_radians)
-    else:
-        angle_degrees = 360 - np.degrees(theta_radians)
-    
-    reference_vector = a
-    return angle_degrees
+# 이전 손 위치 주변만 잘라서 인식 (hand.RoiTracker)
+ROI_TRACKING = True
+
+# 손 인식에 쓰는 카메라 lores 스트림 크기 (None이면 main 스트림을 그대로 사용)
+INFERENCE_SIZE = (320, 240)
+
+# 성능 계측 로그(JSON Lines, None이면 기록 안 함)와 화면 오버레이 (D 키로 켜고 끔)
+TELEMETRY_LOG = None
+SHOW_OVERLAY = False
+
+# 회전을 맡지 않은 손이 주먹을 쥐면 다음 모델로 전환 (대기 시간은 hand_tracking.MODEL_SWITCH_COOLDOWN)
+FIST_SWITCHES_MODEL = True
+
+# 틱과 손 인식 시간을 재서 인식 해상도, 인식 간격, Hands 설정을 조절 (qos.QualityController)
+ADAPTIVE_QUALITY = True
+
+# 인식에 넣은 카메라 프레임과 랜드마크를 오른쪽 아래에 작게 표시 (P 키로 켜고 끔)
+SHOW_PIP = False
+PIP_SIZE = (240, 180)
 
 class WithCameraUI(ui.ImageRotationUI):
-    def __init__(self, model, mp_draw, mp_hands):
-        self.cam = camera_load.newCamera()
+    def __init__(self, mp_draw=None, mp_hands=None, hands_config=None):
+        """mp_draw, mp_hands: HandRecog에 넘기는 mediapipe 모듈 (디버그 표시는 hand_overlay를 쓰므로 기본은 None)"""
+        self.startup = {}
+
+        # 손 인식은 별도 프로세스에서 실행 (mediapipe import와 모델 준비를 창과 동시에 진행)
+        self.worker = hand_worker.InferenceWorker(hands_config, tracking=ROI_TRACKING)
+        self.gate = hand.MotionGate()
+
+        # 카메라는 캡처 스레드 안에서 연다
+        self.capture = camera_load.CaptureThread(lambda: camera_load.newCamera(lores_size=INFERENCE_SIZE))
+        self.capture.start()
+        self.last_frame_seq = 0
 
-        self.model = model
         self.mp_draw = mp_draw
         self.mp_hands = mp_hands
         self.hand_found = False
-        super().__init__()
-        
+        self.styled_hand_found = None
+        self.gesture_active = False
+        # 부하가 높으면 인식 품질을 낮춘다 (단계는 qos.LEVELS)
+        self.qos = qos.QualityController() if ADAPTIVE_QUALITY else None
+        self.base_hands_config = dict(self.worker.hands_config)
+        self.last_submit = 0.0
+        self.small_frame = None
+
+        self.show_pip = SHOW_PIP
+        self.pip = hand_overlay.HandOverlay(point_radius=2, line_thickness=1)
+        # 인식에 넘긴 프레임의 작은 복사본과 그 번호 (결과가 돌아오면 같은 프레임에 그린다)
+        self.pip_frame = None
+        self.pip_seq = None
+
+        # 손 회전 -> 프레임 인덱스 (프레임 수는 모델을 불러올 때 정해짐)
+        self.rotation = rotation.RotationController(1, ROTATION_DIRECTION)
+        # 손 번호, 제스처, 회전을 맡은 손, 주먹 전환 (benchmark.py도 같은 것을 쓴다)
+        self.hand_control = hand_tracking.HandControl(self.rotation)
+        super().__init__(telemetry_log=TELEMETRY_LOG, show_overlay=SHOW_OVERLAY)
+        if self.qos is not None:
+            self.telemetry.set("qos_level", self.qos.level.name)
+
+    def switch_model(self, image_path):
+        super().switch_model(image_path)
+        self.rotation.set_frame_count(self.max_image_index)
+
+    def log_startup(self, name, when=None):
+        """시작 후 처음 일어난 일까지 걸린 시간을 한 번만 기록한다."""
+        if name in self.startup:
+            return
+        seconds = (time.monotonic() if when is None else when) - START_TIME
+        self.startup[name] = seconds
+        self.telemetry.set(f"startup_{name}_s", round(seconds, 3))
+        print(f"startup: {name} {seconds:.2f}s")
+
     def get_next_index(self) -> int:
         current_index = super().get_next_index()
-        frame = camera_load.getFrame(self.cam)
-        recog = hand.HandRecog(self.model, self.mp_draw, self.mp_hands, frame)
-        
-        cmdClear()
-        print("hand found:", recog.handExists())
-        print("thumb and index finger are close:", recog.isPickingGesture())
-
-        self.hand_found = recog.handExists()
-        if not self.hand_found or not recog.isPickingGesture():
-            return current_index
-
-        # if doing picking gesture
-        
-        # wrist index: 0
-        wrist_point = np.array([*recog.getPointFromIdx(0)])
-        # middle mcp index: 9
-        middle_mcp_point = np.array([*recog.getPointFromIdx(9)])
-        
-        hand_direction_vec = middle_mcp_point - wrist_point
-        angle = delta_angle(hand_direction_vec)
-
-        print("angle: %.3f degree" % angle)
-
-        try:
-            result_idx = round(angle / 4)
-            return (current_index + result_idx) % self.max_image_index
-        except ValueError:
-            return current_index
+        if self.canvas.first_paint is not None:
+            self.log_startup("first_frame", self.canvas.first_paint)
+
+        # 가장 최근 인식 결과 (없으면 None)
+        result = self.worker.poll()
+        if self.worker.ready:
+            self.log_startup("model_ready", self.worker.ready_time)
+
+        # 인식 프로세스가 준비를 마치고 놀고 있으면 캡처 스레드가 채운 가장 최근 프레임을 넘긴다
+        # 화면이 거의 바뀌지 않았으면 넘기지 않고 이전 결과를 그대로 쓴다
+        frame, timestamp, seq = self.capture.latest()
+        now = time.monotonic()
+        min_interval = 0.0 if self.qos is None else self.qos.level.min_interval
+        if frame is not None and seq != self.last_frame_seq and self.worker.ready and not self.worker.busy \
+                and now - self.last_submit >= min_interval:
+            self.last_frame_seq = seq
+            with self.telemetry.timer("gate"):
+                infer = self.gate.should_infer(frame)
+            if infer:
+                with self.telemetry.timer("submit"):
+                    submitted = self.inference_frame(frame)
+                    self.worker.submit(submitted, seq, timestamp)
+                self.last_submit = now
+                if self.show_pip:
+                    # 캡처 버퍼는 결과가 오기 전에 덮이므로 미리보기 크기로 복사해 둔다
+                    self.pip_frame = cv2.resize(submitted, PIP_SIZE, dst=self.pip_frame, interpolation=cv2.INTER_AREA)
+                    self.pip_seq = seq
+            else:
+                self.telemetry.count("frames_skipped")
+
+        self.telemetry.set("camera_dropped", self.capture.dropped)
+        self.telemetry.set("camera_repeated", self.capture.repeated)
+        self.telemetry.set("idle", self.gate.idle)
+
+        # 새 인식 결과가 있을 때만 손 방향과 각속도를 갱신
+        if result is not None:
+            self.log_startup("first_inference")
+            # 캡처부터 결과를 받기까지 걸린 시간
+            self.telemetry.record("capture_to_result", time.monotonic() - result.timestamp)
+            self.telemetry.count("inferences")
+            self.telemetry.record("inference", result.inference_seconds)
+            if self.qos is not None:
+                self.qos.observe_inference(result.inference_seconds)
+
+            with self.telemetry.timer("gesture"):
+                recog = hand.HandRecog.fromArrays(result.landmarks, result.world_landmarks, result.handedness,
+                                                  self.mp_draw, self.mp_hands)
+
+                self.hand_found = recog.handExists()
+                self.gate.update(self.hand_found)
+                if self.hand_found:
+                    self.telemetry.count("hands_found")
+
+                self.update_hands(result)
+            # 집는 동작 중에는 틱 간격을 줄인다
+            self.gesture_active = self.rotation.active
+
+            # 결과를 계산한 프레임이 남아 있을 때만 그린다 (다른 프레임에 그리면 손과 어긋난다)
+            if self.show_pip and result.seq == self.pip_seq:
+                with self.telemetry.timer("pip"):
+                    self.update_pip(self.pip_frame, result.landmarks)
+
+        # 인식 결과 사이에도 화면에 그릴 시각까지 외삽해서 돌린다
+        next_index = self.rotation.step(current_index, time.monotonic())
+        if self.rotation.active:
+            self.telemetry.set("angle", round(self.rotation.displayed, 1))
+            self.telemetry.set("angular_velocity", round(self.rotation.velocity, 1))
+        return next_index
+
+    def update_hands(self, result):
+        """모든 손의 번호, 제스처, 방향을 한 번에 계산해서 회전과 모델 전환에 나눠 쓴다."""
+        control = self.hand_control
+        owner = control.owner
+        switch = control.update(result.landmarks, result.world_landmarks, result.handedness, result.timestamp)
+        self.telemetry.set("hands", control.count)
+        if control.owner != owner:
+            self.telemetry.set("rotation_hand", control.owner)
+        if FIST_SWITCHES_MODEL and switch:
+            self.telemetry.count("model_switches")
+            self.next_model()
+
+    def next_model(self):
+        current = self.pending_path or self.path
+        paths = ui.RENDER_MODEL_PATHS
+        index = paths.index(current) + 1 if current in paths else 0
+        self.set_image(paths[index % len(paths)])
+
+    def inference_frame(self, frame):
+        """품질 단계의 배율만큼 줄인 프레임 (같은 버퍼를 다시 쓴다)"""
+        scale = 1.0 if self.qos is None else self.qos.level.scale
+        if scale >= 1.0:
+            return frame
+        h, w = frame.shape[:2]
+        size = (round(w * scale), round(h * scale))
+        if self.small_frame is None or self.small_frame.shape[:2] != (size[1], size[0]):
+            self.small_frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        else:
+            cv2.resize(frame, size, dst=self.small_frame, interpolation=cv2.INTER_AREA)
+        return self.small_frame
+
+    def update_quality(self, now):
+        # 이번 틱의 처리 시간과 마지막으로 그린 시간
+        timers = self.telemetry.timers
+        self.qos.observe_frame(timers["tick"].last + (timers["paint"].last if "paint" in timers else 0.0))
+
+        previous = self.qos.level
+        level = self.qos.update(now)
+        if level is None:
+            return
+        config = dict(self.base_hands_config, **level.hands_config)
+        if config != self.worker.hands_config:
+            self.worker.reconfigure(config)
+
+        self.telemetry.set("qos_level", level.name)
+        self.telemetry.set("qos_reason", self.qos.reason)
+        self.telemetry.count("qos_changes")
+        print(f"qos: {previous.name} -> {level.name} ({self.qos.reason})")
+
+    def update_pip(self, frame, landmarks):
+        # 버퍼를 다시 쓰므로 QImage는 복사하지 않고 버퍼를 그대로 가리킨다
+        image = self.pip.render(frame, landmarks, PIP_SIZE)
+        h, w = image.shape[:2]
+        self.canvas.set_pip(QtGui.QImage(image.data, w, h, image.strides[0], QtGui.QImage.Format_RGB888))
+
+    def keyPressEvent(self, e):
+        super().keyPressEvent(e)
+        if e.key() == Qt.Key.Key_P:
+            self.show_pip = not self.show_pip
+            if not self.show_pip:
+                self.canvas.set_pip(None)
+                self.pip_seq = None
+
+    def is_active(self) -> bool:
+        return super().is_active() or self.gesture_active
+
+    def tick_interval(self, now) -> int:
+        # 카메라와 인식 결과도 이 타이머로 가져오므로, 손이 보이거나 게이트가 대기 모드가 아니면
+        # 화면이 멈춰 있어도 느린 간격으로 내리지 않는다 (집기 시작을 늦게 알아채지 않게)
+        interval = super().tick_interval(now)
+        if self.hand_found or not self.gate.idle:
+            return min(interval, ui.TICK_NORMAL_MS)
+        return interval
 
     def update_images(self):
         super().update_images()
-        if self.hand_found:
-            self.setStyleSheet("background-color: black;")
-        else:
-            self.setStyleSheet("background-color: gray;")
-        
+        if self.qos is not None:
+            self.update_quality(time.monotonic())
+        # 스타일 시트를 바꾸면 위젯 전체를 다시 꾸미므로 상태가 바뀔 때만 설정한다
+        if self.hand_found != self.styled_hand_found:
+            self.styled_hand_found = self.hand_found
+            if self.hand_found:
+                self.setStyleSheet("background-color: black;")
+            else:
+                self.setStyleSheet("background-color: gray;")
+
     def closeEvent(self, e):
-        camera_load.closeCamera(self.cam)
+        # 타이머를 먼저 멈춰서 닫는 도중에 틱이 돌지 않게 한다
+        self.timer.stop()
+        self.capture.stop()
+        self.worker.close()
         super().closeEvent(e)
 
 
-drawingModule = mp.solutions.drawing_utils
-handsModule = mp.solutions.hands
-with handsModule.Hands(
-    static_image_mode=False,
-    min_detection_confidence=0.4,
-    min_tracking_confidence=0.4,
-    max_num_hands=2
-) as hands:
+if __name__ == "__main__":
     app = QApplication(sys.argv)
-    window = WithCameraUI(hands, drawingModule, handsModule)
-    sys.exit(app.exec_())
\ No newline at end of file
+    window = WithCameraUI(hands_config=hand_worker.DEFAULT_HANDS_CONFIG)
+    sys.exit(app.exec_())
@@ -0,0 +1,182 @@
+from PyQt5.QtGui import QImage, QPixmap
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import time
+
+import frame_cache
+import model_manifest
+
+
+def circular_order(index, count):
+    """index에서 가까운 순서로 0 ~ count-1 을 나열한다. (index, +1, -1, +2, -2, ...)"""
+    yield index % count
+    for d in range(1, count // 2 + 1):
+        yield (index + d) % count
+        if (index - d) % count != (index + d) % count:
+            yield (index - d) % count
+
+
+def load_frame(manifest, index, max_size):
+    # 작업 스레드에서는 QPixmap을 만들 수 없으므로 QImage로 변환한다
+    image = frame_cache.build_frame(manifest.load_image(index, max_size), max_size)
+    # 구워 둔 이미지는 아카이브(mmap)를 가리키므로, 디스크 읽기와 픽스맵 형식 변환을
+    # GUI 스레드의 QPixmap.fromImage에 남기지 않도록 여기서 픽셀을 복사해 변환해 둔다
+    return image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+
+class ModelLoader:
+    """모델 목록 읽기와 프레임 디코딩을 백그라운드 작업 스레드에서 처리한다
+
+    작업 스레드는 크기 조정된 QImage까지만 만들고,
+    GUI 스레드에서 호출되는 poll()이 완료된 결과를 QPixmap으로 바꿔 캐시에 넣는다.
+    현재 인덱스에서 가까운 프레임부터 불러오고, 한 번에 예약하는 작업 수를 제한해서
+    인덱스가 바뀌면 새 위치 주변이 바로 우선순위를 갖도록 한다.
+    """
+
+    def __init__(self, cache: frame_cache.FrameCache, max_size, workers=2,
+                 prefetch_radius=5, prefetch_models=()):
+        self.cache = cache
+        self.max_size = tuple(max_size)
+        self.workers = workers
+        self.prefetch_radius = prefetch_radius
+        self.prefetch_models = list(prefetch_models)
+
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="model-loader")
+        self.manifests = {}  # path -> Future[ModelManifest]
+        self.jobs = {}  # (path, index) -> (Future[QImage], max_size)
+        self.requested = []  # 표시 전환을 기다리는 모델
+        self.prefetched = set()  # 한 번 미리 불러온 다른 모델 (캐시에서 지워지면 다시 불러오지 않음)
+
+    def key(self, path):
+        return (path, self.max_size)
+
+    def set_max_size(self, max_size):
+        # 이전 크기의 프레임은 고정이 풀려 LRU 순서대로 지워진다
+        self.max_size = tuple(max_size)
+
+    def request(self, path):
+        if path not in self.manifests:
+            self.manifests[path] = self.executor.submit(model_manifest.ModelManifest, path)
+        if path not in self.requested:
+            self.requested.append(path)
+
+    def manifest(self, path):
+        """목록이 준비되지 않았으면 None, 검증에 실패했으면 예외를 다시 일으킨다."""
+        future = self.manifests.get(path)
+        if future is None or not future.done():
+            return None
+        return future.result()
+
+    def forget(self, path):
+        if path in self.requested:
+            self.requested.remove(path)
+        # 실패한 목록은 다음 요청 때 다시 읽는다
+        future = self.manifests.get(path)
+        if future is not None and future.done() and future.exception() is not None:
+            del self.manifests[path]
+
+    def frames(self, path) -> list:
+        manifest = self.manifest(path)
+        return self.cache.frames(self.key(path), manifest.frame_count)
+
+    def is_ready(self, path, index=0, count=None) -> bool:
+        """index 주변 count장(기본: prefetch_radius 안쪽)이 준비됐는지"""
+        manifest = self.manifest(path)
+        if manifest is None:
+            return False
+
+        frames = self.cache.frames(self.key(path), manifest.frame_count)
+        count = min(manifest.frame_count, self.prefetch_radius * 2 + 1 if count is None else count)
+        order = circular_order(index, manifest.frame_count)
+        return all(frames[next(order)] is not None for _ in range(count))
+
+    ##############################################################################
+
+    def poll(self, current_path, current_index):
+        """GUI 스레드에서 매 틱 호출: 완료된 프레임을 캐시에 넣고 다음 작업을 예약한다."""
+        for job_key, (future, max_size) in list(self.jobs.items()):
+            if not future.done():
+                continue
+            del self.jobs[job_key]
+            path, index = job_key
+            try:
+                image = future.result()
+            except Exception as e:
+                print("frame load failed:", e)
+                continue
+            self.cache.put((path, max_size), index, QPixmap.fromImage(image))
+
+        if current_path in self.requested:
+            self.requested.remove(current_path)
+
+        self.cache.touch(self.key(current_path))
+        targets = [(current_path, current_index)]
+        targets += [(path, 0) for path in self.requested]
+        self.cache.pin(self.key(path) for path, _ in targets if path is not None)
+        for path, index in targets:
+            self.cache.set_focus(self.key(path), index)
+
+        # 여유가 있을 때만 다른 모델을 미리 불러온다
+        if not self.cache.is_full():
+            for path in self.prefetch_models:
+                if any(path == i for i, _ in targets):
+                    continue
+                if self.key(path) in self.cache.models:
+                    self.prefetched.add(path)
+                elif path in self.prefetched:
+                    continue
+                if path not in self.manifests:
+                    self.manifests[path] = self.executor.submit(model_manifest.ModelManifest, path)
+                targets.append((path, 0))
+
+        self.schedule(targets)
+
+    def schedule(self, targets):
+        # 먼저 각 모델의 현재 위치 주변을, 그 다음에 나머지 프레임을 예약한다
+        # 나머지 프레임은 메모리 한도 안에 들어가는 만큼만 (가까운 순서로) 불러온다
+        budget = self.workers * 4 - len(self.jobs)
+        share = len(targets)
+        for near in (True, False):
+            for path, index in targets:
+                if path is None:
+                    continue
+                try:
+                    manifest = self.manifest(path)
+                except Exception:
+                    continue
+                if manifest is None:
+                    continue
+                # 지금 크기에 맞게 구워 둔 아카이브만 열어 둔다 (이전 크기는 닫힘)
+                try:
+                    manifest.select_lod(self.max_size)
+                except Exception as e:
+                    print("cannot open level archive:", e)
+
+                frames = self.cache.frames(self.key(path), manifest.frame_count)
+                order = circular_order(index, manifest.frame_count)
+                if near:
+                    order = itertools.islice(order, self.prefetch_radius * 2 + 1)
+                else:
+                    limit = self.cache.frame_limit(self.key(path), share)
+                    if limit is not None:
+                        order = itertools.islice(order, max(limit, self.prefetch_radius * 2 + 1))
+                for i in order:
+                    if budget <= 0:
+                        return
+                    if frames[i] is not None or (path, i) in self.jobs:
+                        continue
+                    future = self.executor.submit(load_frame, manifest, i, self.max_size)
+                    self.jobs[(path, i)] = (future, self.max_size)
+                    budget -= 1
+
+    def wait_ready(self, path, index=0, timeout=30.0, count=None):
+        """시작할 때처럼 GUI가 아직 없을 때만 사용한다."""
+        deadline = time.monotonic() + timeout
+        while not self.is_ready(path, index, count):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"loading {path} timed out")
+            self.poll(path, index)
+            time.sleep(0.005)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
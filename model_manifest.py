@@ -0,0 +1,165 @@
+from PyQt5.QtGui import QImage
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+import frame_archive
+
+FRAME_PATTERN = re.compile(r"^frame_(\d+)\.png$")
+
+# 화면에 보여줄 밝기 배율. video_generator.py는 보정하지 않은 PNG를 저장하고 render_manifest.json에 기록한다
+BRIGHTNESS = 1.5
+# video_generator.MANIFEST_NAME (Blender 안에서도 도는 모듈이라 import하지 않는다)
+RENDER_MANIFEST = "render_manifest.json"
+
+
+def frames_brightened(path) -> bool:
+    """render/model_N 폴더의 PNG가 이미 밝기 보정된 것인지
+
+    render_manifest.json이 없는 예전 렌더링과 RENDER_VERSION 1(params에 brightness가 있음)은
+    PIL로 보정해서 저장했다."""
+    try:
+        with open(os.path.join(path, RENDER_MANIFEST), encoding="utf-8") as f:
+            data = json.load(f)
+    except OSError:
+        return True
+    except ValueError:
+        return False
+    if "brightened" in data:
+        return bool(data["brightened"])
+    return "brightness" in data.get("params", {})
+
+
+def brightness_table(factor) -> np.ndarray:
+    # PIL ImageEnhance.Brightness와 같은 결과: 색상 채널에 factor를 곱하고 알파는 그대로 둔다
+    return np.clip(np.arange(256) * factor + 0.5, 0, 255).astype(np.uint8)
+
+
+def brighten(frames: np.ndarray, table: np.ndarray):
+    """frames: (..., 4) uint8 RGBA, 제자리에서 바꾼다"""
+    frames[..., :3] = table[frames[..., :3]]
+
+
+def brighten_image(image: QImage, table: np.ndarray) -> QImage:
+    image = image.convertToFormat(QImage.Format_RGBA8888)
+    w, h = image.width(), image.height()
+    bits = image.bits()
+    bits.setsize(image.sizeInBytes())
+    brighten(np.frombuffer(bits, np.uint8).reshape(h, image.bytesPerLine())[:, :w * 4].reshape(h, w, 4), table)
+    return image
+
+
+class ModelManifest:
+    """모델 하나의 프레임 목록
+
+    ./render/model_N.hfa 아카이브가 있으면 그것을 mmap으로 열고,
+    없으면 render/model_N 폴더의 PNG를 파일 이름의 번호 순서대로 정렬한 뒤
+    번호가 1부터 빠짐없이 이어지는지 확인한다.
+    bake.py로 만든 크기별 아카이브(model_N.<크기>.hfa)는 경로만 기억해 두고,
+    select_lod()로 지금 표시하는 크기 하나만 열어 둔다 (모든 크기를 mmap하면 32비트 Pi에서 주소 공간이 모자람).
+    아카이브는 bake.py가 밝기를 보정해서 만든다. PNG를 직접 읽을 때는 보정하지 않은 프레임이면
+    여기서 같은 배율을 적용해서, 어느 경로로 읽어도 화면 밝기가 같게 한다.
+    """
+
+    def __init__(self, path, use_archive=True):
+        self.path = path
+        self.archive = None
+        self.frame_paths = []
+        self.lod_paths = {}  # box size -> 아카이브 경로
+        self.lod = None  # 열어 둔 크기별 아카이브 하나
+        self.lod_box = None
+        self.lod_lock = threading.Lock()
+        # 보정하지 않은 PNG를 화면 밝기로 맞추는 배율 (아카이브는 이미 보정됨)
+        self.brightness = 1.0 if frames_brightened(path) else BRIGHTNESS
+
+        if use_archive:
+            self.lod_paths = frame_archive.find_lods(path)
+            archive_path = frame_archive.archive_path(path)
+            if os.path.exists(archive_path):
+                self.archive = frame_archive.FrameArchive(archive_path)
+            elif not os.path.isdir(path) and self.lod_paths:
+                # 크기별 아카이브만 배포한 경우
+                self.archive = frame_archive.FrameArchive(self.lod_paths[max(self.lod_paths)])
+        if self.archive is None:
+            self.frame_paths = self.scan(path)
+
+        for box, lod_path in self.lod_paths.items():
+            frame_count = frame_archive.read_header(lod_path)[1]
+            if frame_count != self.frame_count:
+                raise ValueError(f"{lod_path} has {frame_count} frames, expected {self.frame_count}")
+
+    @staticmethod
+    def scan(path) -> list:
+        numbered = []
+        for name in os.listdir(path):
+            if not name.lower().endswith(".png"):
+                continue
+            match = FRAME_PATTERN.match(name)
+            if match is None:
+                raise ValueError(f"unexpected file in model folder: {name}")
+            numbered.append((int(match.group(1)), name))
+
+        numbered.sort()
+        if not numbered:
+            raise ValueError(f"no frames in {path}")
+        for expected, (number, name) in enumerate(numbered, start=1):
+            if number != expected:
+                raise ValueError(f"frame {expected} is missing in {path} (found {name})")
+
+        return [os.path.join(path, name) for _, name in numbered]
+
+    @property
+    def frame_count(self) -> int:
+        if self.archive is not None:
+            return self.archive.frame_count
+        return len(self.frame_paths)
+
+    @property
+    def lod_sizes(self) -> list:
+        return sorted(self.lod_paths)
+
+    def select_lod(self, max_size):
+        """max_size에 맞게 구워 둔 아카이브를 열고 이전에 열어 둔 것은 닫는다 (GUI 스레드에서 호출)"""
+        box = max_size[0] if max_size[0] == max_size[1] and max_size[0] in self.lod_paths else None
+        if box == self.lod_box:
+            return
+        lod = None
+        if box is not None:
+            path = self.lod_paths[box]
+            if self.archive is not None and self.archive.path == path:
+                lod = self.archive
+            else:
+                try:
+                    lod = frame_archive.FrameArchive(path)
+                except Exception:
+                    # 열 수 없는 크기는 잊고 기본 아카이브에서 크기를 조정한다
+                    del self.lod_paths[box]
+                    raise
+        with self.lod_lock:
+            previous, self.lod, self.lod_box = self.lod, lod, box
+        if previous is not None and previous is not self.archive:
+            # 아직 읽는 중인 이미지가 있으면 close()가 GC에 맡긴다
+            previous.close()
+
+    def load_image(self, index, max_size=None) -> QImage:
+        """작업 스레드에서 호출해도 된다.
+
+        select_lod()로 열어 둔 아카이브가 max_size에 맞으면 그 이미지를 돌려주므로 크기 조정이 필요 없다.
+        (크기가 바뀌기 전에 예약된 작업은 기본 아카이브에서 읽어 크기를 조정한다)
+        """
+        if max_size is not None:
+            with self.lod_lock:
+                if self.lod is not None and tuple(max_size) == (self.lod_box, self.lod_box):
+                    return self.lod.frame_image(index)
+        if self.archive is not None:
+            return self.archive.frame_image(index)
+
+        image = QImage(self.frame_paths[index])
+        if image.isNull():
+            raise ValueError(f"cannot decode {self.frame_paths[index]}")
+        if self.brightness != 1.0:
+            image = brighten_image(image, brightness_table(self.brightness))
+        return image
@@ -0,0 +1,117 @@
+"""부하에 따라 손 인식 품질을 낮추고 올리는 제어기
+
+실행 중에 화면 틱(틱 처리 + 그리기) 시간과 작업 프로세스의 손 인식 시간을 재서,
+목표 시간을 DEGRADE_AFTER초 동안 넘으면 한 단계 낮추고,
+RECOVER_BELOW 비율 아래로 RECOVER_AFTER초 동안 유지되면 한 단계 올린다.
+단계마다 인식 해상도 배율, 최소 인식 간격, Hands 설정(max_num_hands, model_complexity)이 정해져 있다.
+단계가 바뀔 때마다 이유를 남기므로 화면 오버레이와 로그에서 왜 품질이 떨어졌는지 볼 수 있다.
+"""
+import typing
+
+# 목표 시간 (초): 틱 한 번의 작업 시간, 손 인식 한 번의 시간
+TARGET_FRAME = 0.025
+TARGET_INFERENCE = 0.1
+# 목표를 넘은 상태가 이만큼 계속되면 낮추고, 목표의 RECOVER_BELOW배 아래로 이만큼 계속되면 올린다
+DEGRADE_AFTER = 1.0
+RECOVER_AFTER = 5.0
+RECOVER_BELOW = 0.6
+# 지수 이동 평균 계수
+SMOOTHING = 0.2
+
+
+class QualityLevel(typing.NamedTuple):
+    name: str
+    scale: float  # 인식에 넣는 프레임 크기 배율
+    min_interval: float  # 인식 요청 사이의 최소 간격 (초)
+    hands_config: dict  # hand_worker.DEFAULT_HANDS_CONFIG에 덮어쓸 값
+
+
+LEVELS = (
+    QualityLevel("full", 1.0, 0.0, {}),
+    QualityLevel("rate_15hz", 1.0, 1 / 15, {}),
+    QualityLevel("small", 0.75, 1 / 15, {}),
+    QualityLevel("one_hand", 0.75, 1 / 10, {"max_num_hands": 1}),
+    QualityLevel("lite", 0.5, 1 / 8, {"max_num_hands": 1, "model_complexity": 0}),
+)
+
+
+class QualityController:
+    def __init__(self, levels=LEVELS, target_frame=TARGET_FRAME, target_inference=TARGET_INFERENCE,
+                 degrade_after=DEGRADE_AFTER, recover_after=RECOVER_AFTER, recover_below=RECOVER_BELOW,
+                 smoothing=SMOOTHING):
+        self.levels = levels
+        self.target_frame = target_frame
+        self.target_inference = target_inference
+        self.degrade_after = degrade_after
+        self.recover_after = recover_after
+        self.recover_below = recover_below
+        self.smoothing = smoothing
+
+        self.index = 0
+        self.reason = "start"
+        self.changes = []  # [(시각, 이전 단계 이름, 새 단계 이름, 이유)]
+        self.reset()
+
+    @property
+    def level(self) -> QualityLevel:
+        return self.levels[self.index]
+
+    def reset(self):
+        # 단계를 바꾼 뒤에는 새 단계에서 다시 잰다
+        self.frame = None
+        self.inference = None
+        self.over_since = None
+        self.under_since = None
+
+    def average(self, current, value):
+        return value if current is None else current + self.smoothing * (value - current)
+
+    def observe_frame(self, seconds):
+        self.frame = self.average(self.frame, seconds)
+
+    def observe_inference(self, seconds):
+        self.inference = self.average(self.inference, seconds)
+
+    def load(self) -> typing.Optional[float]:
+        """목표 대비 가장 빠듯한 쪽의 비율 (1을 넘으면 목표를 넘은 것). 잰 값이 없으면 None"""
+        ratios = [value / target for value, target in ((self.frame, self.target_frame),
+                                                       (self.inference, self.target_inference))
+                  if value is not None]
+        return max(ratios) if ratios else None
+
+    def describe(self) -> str:
+        def ms(value):
+            return "-" if value is None else f"{value * 1000:.1f}"
+        return f"frame {ms(self.frame)}/{self.target_frame * 1000:.0f}ms, " \
+               f"inference {ms(self.inference)}/{self.target_inference * 1000:.0f}ms"
+
+    def update(self, now) -> typing.Optional[QualityLevel]:
+        """단계가 바뀌었으면 새 QualityLevel을, 아니면 None을 돌려준다."""
+        load = self.load()
+        if load is None:
+            return None
+
+        if load > 1.0:
+            self.under_since = None
+            if self.over_since is None:
+                self.over_since = now
+        elif load < self.recover_below:
+            self.over_since = None
+            if self.under_since is None:
+                self.under_since = now
+        else:
+            self.over_since = self.under_since = None
+
+        if self.over_since is not None and now - self.over_since >= self.degrade_after \
+                and self.index < len(self.levels) - 1:
+            return self.change(self.index + 1, now, "over budget: " + self.describe())
+        if self.under_since is not None and now - self.under_since >= self.recover_after and self.index > 0:
+            return self.change(self.index - 1, now, "recovered: " + self.describe())
+        return None
+
+    def change(self, index, now, reason) -> QualityLevel:
+        self.changes.append((now, self.level.name, self.levels[index].name, reason))
+        self.index = index
+        self.reason = reason
+        self.reset()
+        return self.level
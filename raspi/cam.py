@@ -19,8 +19,12 @@ class CameraWindow(QMainWindow):
         self.setGeometry(0, 0, self.screen_width, self.screen_height)
 
         # Initialize the camera
+        # main: 화면에 보여줄 스트림 (BGR888은 메모리에 R, G, B 순서 -> 색 변환 없이 QImage로)
+        # 미리보기만 하므로 lores 스트림은 만들지 않는다 (손 인식은 recog.py)
         self.picam2 = Picamera2()
-        camera_config = self.picam2.create_preview_configuration()
+        camera_config = self.picam2.create_preview_configuration(
+            main={"size": (640, 480), "format": "BGR888"},
+        )
         self.picam2.configure(camera_config)
         self.picam2.start()
 
@@ -39,7 +43,7 @@ class CameraWindow(QMainWindow):
 
     def update_frame(self):
         # Capture a frame as a NumPy array
-        frame = self.picam2.capture_array()
+        frame = self.picam2.capture_array("main")
 
         # Convert the frame to QImage
         height, width, channels = frame.shape
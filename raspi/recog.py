@@ -2,7 +2,6 @@
 import mediapipe as mp
 from picamera2 import Picamera2
 import cv2
-import numpy as np
 
 # Use MediaPipe to draw the hand framework over the top of hands it identifies in Real-Time
 drawingModule = mp.solutions.drawing_utils
@@ -12,7 +11,13 @@ handsModule = mp.solutions.hands
 picam2 = Picamera2()
 
 # Configure the camera settings
-camera_config = picam2.create_preview_configuration(main={"size": (640, 480)})
+# main은 화면 표시용, lores는 손 인식용 작은 YUV420 스트림 (큰 프레임을 색 변환하지 않음)
+# picamera2의 RGB888은 메모리에 [B, G, R] 순서라서 cv2.imshow에 바로 쓸 수 있다
+INFERENCE_SIZE = (320, 240)
+camera_config = picam2.create_preview_configuration(
+    main={"size": (640, 480), "format": "RGB888"},
+    lores={"size": INFERENCE_SIZE, "format": "YUV420"},
+)
 picam2.configure(camera_config)
 
 # Start the camera
@@ -25,21 +30,21 @@ with handsModule.Hands(
     max_num_hands=2
 ) as hands:
     while True:
-        # Capture the frame
-        frame = picam2.capture_array()
-        frame = np.ascontiguousarray(frame, dtype=np.uint8)
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # Capture both streams from the same request
+        (frame, lores), _ = picam2.capture_arrays(["main", "lores"])
+        w, h = INFERENCE_SIZE
+        lores_rgb = cv2.cvtColor(lores[:h * 3 // 2, :w], cv2.COLOR_YUV2RGB_I420)
 
-        # Process the frame to detect hands
-        results = hands.process(frame_rgb)
+        # Process the small frame to detect hands
+        results = hands.process(lores_rgb)
 
-        # Check if hands are detected and draw landmarks
+        # Check if hands are detected and draw landmarks (정규화 좌표라 main 프레임에 그대로 그린다)
         if results.multi_hand_landmarks:
             for hand_landmarks in results.multi_hand_landmarks:
-                drawingModule.draw_landmarks(frame_rgb, hand_landmarks, handsModule.HAND_CONNECTIONS)
+                drawingModule.draw_landmarks(frame, hand_landmarks, handsModule.HAND_CONNECTIONS)
 
         # Display the frame with hand landmarks
-        cv2.imshow("Frame", frame_rgb)
+        cv2.imshow("Frame", frame)
 
         # Exit the loop if 'q' is pressed
         key = cv2.waitKey(1) & 0xFF
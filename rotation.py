@@ -0,0 +1,93 @@
+"""손 방향으로 홀로그램을 돌리는 회전 제어기
+
+손 인식 결과는 캡처 시각이 붙어서 10~15Hz 정도로 늦게 들어온다.
+RotationController는 결과마다 손목->중지 MCP 벡터의 회전량으로 각속도를 추정해 두고,
+화면 틱마다 그 시각까지 외삽한 각도만큼 프레임 인덱스를 움직인다.
+그래서 인식 결과 사이에도 화면이 부드럽게 돌고, 캡처와 인식 지연만큼 늦게 따라오지 않는다.
+"""
+import numpy as np
+
+# 한 번에 외삽하는 최대 시간 (초). 손이 멈추거나 사라졌을 때 너무 앞서 나가지 않게 한다.
+MAX_EXTRAPOLATION = 0.15
+# 각속도 지수 이동 평균 계수 (1에 가까울수록 최근 값을 따름)
+VELOCITY_SMOOTHING = 0.5
+
+
+def hand_directions(landmarks) -> np.ndarray:
+    """(hands, 21, 3) -> (hands, 2): 모든 손의 손목(0) -> 중지 MCP(9) 벡터"""
+    return landmarks[:, 9, :2] - landmarks[:, 0, :2]
+
+
+def signed_angle(a, b, direction=1) -> float:
+    """a에서 b로 돌아간 각도 (도, -180 ~ 180). direction이 0이면 부호가 반대"""
+    angle = np.degrees(np.arctan2(a[0] * b[1] - a[1] * b[0], a[0] * b[0] + a[1] * b[1]))
+    return float(angle if direction else -angle)
+
+
+class RotationController:
+    """집는 동안의 누적 회전각을 추적하고 화면 시각의 프레임 인덱스로 바꾼다
+
+    update()는 새 인식 결과가 있을 때, step()은 매 틱 호출한다.
+    """
+
+    def __init__(self, frame_count, direction=1,
+                 max_extrapolation=MAX_EXTRAPOLATION, smoothing=VELOCITY_SMOOTHING):
+        self.frame_count = frame_count
+        self.direction = direction
+        self.max_extrapolation = max_extrapolation
+        self.smoothing = smoothing
+
+        self.reference = None  # 마지막으로 받은 손 방향 (집고 있지 않으면 None)
+        self.timestamp = 0.0  # reference를 캡처한 시각
+        self.angle = 0.0  # 측정한 누적 각도
+        self.velocity = 0.0  # 도/초
+        self.displayed = 0.0  # 마지막으로 화면에 반영한 각도
+        self.applied = 0  # displayed에 해당하는 프레임 수 (이미 인덱스에 더함)
+
+    @property
+    def active(self) -> bool:
+        return self.reference is not None
+
+    def set_frame_count(self, frame_count):
+        # 모델이 바뀌면 지금 각도를 새 프레임 수 기준으로 다시 맞춘다 (인덱스가 튀지 않게)
+        self.frame_count = frame_count
+        self.applied = round(self.displayed * frame_count / 360)
+
+    def update(self, vector, timestamp):
+        """vector: hand_directions()로 구한 회전을 맡은 손의 방향 (None이면 놓은 것), timestamp: 캡처 시각"""
+        if vector is None or not np.any(vector):
+            # 놓으면 화면에 보인 각도에서 멈춘다 (외삽한 만큼 뒤로 돌아가지 않음)
+            self.reference = None
+            self.angle = self.displayed
+            self.velocity = 0.0
+            return
+
+        if self.reference is None:
+            # 새로 집기 시작
+            self.reference = vector
+            self.timestamp = timestamp
+            self.angle = self.displayed
+            self.velocity = 0.0
+            return
+
+        delta = signed_angle(self.reference, vector, self.direction)
+        dt = timestamp - self.timestamp
+        self.angle += delta
+        if dt > 0:
+            self.velocity += self.smoothing * (delta / dt - self.velocity)
+        self.reference = vector
+        self.timestamp = timestamp
+
+    def angle_at(self, now) -> float:
+        if self.reference is None:
+            return self.angle
+        ahead = min(max(now - self.timestamp, 0.0), self.max_extrapolation)
+        return self.angle + self.velocity * ahead
+
+    def step(self, index, now) -> int:
+        """now(화면에 그릴 시각)까지 돌아간 만큼 index를 옮긴다."""
+        self.displayed = self.angle_at(now)
+        frames = round(self.displayed * self.frame_count / 360)
+        delta = frames - self.applied
+        self.applied = frames
+        return (index + delta) % self.frame_count
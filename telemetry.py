@@ -0,0 +1,125 @@
+"""틱마다 쓰는 가벼운 성능 계측
+
+단계별 시간은 최근 N개만 고정 크기 배열에 보관해서 백분위수를 계산하고,
+카운터/게이지와 함께 화면 오버레이 문자열이나 JSON Lines 로그로 내보낸다.
+로그와 오버레이는 interval 초에 한 번만 갱신하므로 틱마다 터미널 I/O가 생기지 않는다.
+"""
+import json
+import time
+import numpy as np
+
+
+class RollingHistogram:
+    """최근 size개의 샘플을 링 버퍼에 보관한다 (단위: 초)"""
+
+    def __init__(self, size=256):
+        self.samples = np.zeros(size, dtype=np.float64)
+        self.count = 0
+
+    def add(self, value):
+        self.samples[self.count % len(self.samples)] = value
+        self.count += 1
+
+    def values(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+    def summary(self):
+        values = self.values()
+        if len(values) == 0:
+            return None
+        p50, p95, p99 = np.percentile(values, (50, 95, 99)) * 1000.0
+        return {"p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3),
+                "mean_ms": round(values.mean() * 1000.0, 3)}
+
+
+class StageTimer:
+    """with 문으로 쓰는 단계 타이머. 단계마다 하나를 만들어 재사용한다."""
+
+    __slots__ = ("histogram", "start", "last")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = 0.0
+        self.last = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.last = time.perf_counter() - self.start
+        self.histogram.add(self.last)
+        return False
+
+
+class Telemetry:
+    def __init__(self, log_path=None, interval=1.0, window=256):
+        self.log_path = log_path
+        self.interval = interval
+        self.window = window
+
+        self.histograms: dict[str, RollingHistogram] = {}
+        self.timers: dict[str, StageTimer] = {}
+        self.counters: dict[str, int] = {}
+        self.gauges: dict[str, object] = {}
+
+        self.log_file = None
+        self.last_flush = time.monotonic()
+        self.overlay = ""
+
+    def timer(self, name) -> StageTimer:
+        timer = self.timers.get(name)
+        if timer is None:
+            self.histograms[name] = RollingHistogram(self.window)
+            timer = self.timers[name] = StageTimer(self.histograms[name])
+        return timer
+
+    def record(self, name, seconds):
+        self.timer(name).histogram.add(seconds)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name, value):
+        self.gauges[name] = value
+
+    def snapshot(self) -> dict:
+        return {
+            "time": time.time(),
+            "stages": {name: h.summary() for name, h in self.histograms.items()},
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+        }
+
+    def tick(self, now=None) -> bool:
+        """틱마다 호출한다. interval이 지났으면 오버레이와 로그를 갱신하고 True를 돌려준다."""
+        now = time.monotonic() if now is None else now
+        if now - self.last_flush < self.interval:
+            return False
+        self.last_flush = now
+
+        snapshot = self.snapshot()
+        self.overlay = self.format(snapshot)
+        if self.log_path is not None:
+            if self.log_file is None:
+                self.log_file = open(self.log_path, "a", encoding="utf-8")
+            self.log_file.write(json.dumps(snapshot) + "\n")
+            self.log_file.flush()
+        return True
+
+    @staticmethod
+    def format(snapshot) -> str:
+        lines = []
+        for name, s in snapshot["stages"].items():
+            if s is not None:
+                lines.append(f"{name}: p50 {s['p50_ms']:.1f} / p95 {s['p95_ms']:.1f} / p99 {s['p99_ms']:.1f} ms")
+        for name, value in snapshot["counters"].items():
+            lines.append(f"{name}: {value}")
+        for name, value in snapshot["gauges"].items():
+            lines.append(f"{name}: {value}")
+        return "\n".join(lines)
+
+    def close(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
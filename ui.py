@@ -1,8 +1,12 @@
-from PyQt5.QtWidgets import QApplication, QWidget, QLabel
-from PyQt5.QtGui import QPixmap, QTransform
-from PyQt5.QtCore import Qt, QTimer
-import os
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout
+from PyQt5.QtGui import QPainter, QTransform
+from PyQt5.QtCore import Qt, QTimer, QPoint
 import sys
+import time
+
+import frame_cache
+import model_loader
+import telemetry
 
 RENDER_MODEL_PATHS = [
     "./render/model_1",
@@ -10,8 +14,139 @@ RENDER_MODEL_PATHS = [
     "./render/model_3"
 ]
 
+# 상단, 하단, 좌측, 우측 이미지의 회전 각도
+VIEW_ROTATIONS = (180, 0, 90, -90)
+
+# 기존 800x600 창 기준의 이미지 최대 크기와 여백
+BASE_HEIGHT = 600
+BASE_BOX = 450
+BASE_MARGIN = 20
+
+# 틱 간격(ms): 제스처나 키 입력 중, 보통, IDLE_AFTER초 동안 화면이 바뀌지 않았을 때
+TICK_ACTIVE_MS = 33
+TICK_NORMAL_MS = 100
+TICK_IDLE_MS = 250
+IDLE_AFTER = 2.0
+
+class HologramCanvas(QWidget):
+    """네 방향 이미지를 하나의 paintEvent에서 그리는 위젯
+
+    배치(각 방향의 변환 행렬)는 크기나 프레임 비율이 바뀔 때만 계산하고,
+    매 틱에는 같은 프레임을 회전 변환만 바꿔 네 번 그린다.
+    """
+
+    def __init__(self, parent=None, on_resize=None, telemetry=None):
+        super().__init__(parent)
+        self.on_resize = on_resize
+        self.telemetry = telemetry
+        self.pixmap = None
+        self.first_paint = None  # 프레임을 처음 그린 시각 (time.monotonic)
+        self.show_overlay = False
+        self.overlay_text = ""
+        self.pip = None  # 오른쪽 아래에 작게 그리는 디버그 이미지 (QImage)
+        self.frame_size = (800, 480)
+        self.box_size = (BASE_BOX, BASE_BOX)
+        self.box_levels = []
+        self.transforms = []
+
+    def set_frame_size(self, width, height):
+        if (width, height) != self.frame_size:
+            self.frame_size = (width, height)
+            self.update_layout()
+
+    def set_box_levels(self, levels):
+        """미리 구워 둔 크기 목록 (bake.LOD_SIZES). 창에 들어가는 가장 큰 크기를 고른다."""
+        levels = sorted(levels)
+        if levels == self.box_levels:
+            return
+        self.box_levels = levels
+        box_size = self.box_size
+        self.update_layout()
+        if self.box_size != box_size and self.on_resize is not None:
+            self.on_resize(self.box_size)
+
+    def set_pixmap(self, pixmap):
+        if pixmap is self.pixmap:
+            return
+        self.pixmap = pixmap
+        self.update()
+
+    def set_overlay_text(self, text):
+        self.overlay_text = text
+        if self.show_overlay:
+            self.update()
+
+    def set_pip(self, image):
+        self.pip = image
+        self.update()
+
+    def resizeEvent(self, e):
+        self.update_layout()
+        if self.on_resize is not None:
+            self.on_resize(self.box_size)
+        super().resizeEvent(e)
+
+    def update_layout(self):
+        w, h = self.width(), self.height()
+        scale = min(w, h) / BASE_HEIGHT
+        box = max(1, round(BASE_BOX * scale))
+        margin = BASE_MARGIN * scale
+
+        # 구워 둔 크기가 있으면 그 중 하나를 써서 실행 중에 크기 조정을 하지 않는다
+        fitting = [i for i in self.box_levels if i <= box]
+        if fitting:
+            box = fitting[-1]
+
+        # 프레임 비율을 유지한 채 box 안에 맞춘 크기
+        fw, fh = self.frame_size
+        fit = min(box / fw, box / fh)
+        ih = fh * fit
+
+        centers = (
+            (w / 2, margin + ih / 2),  # 상단
+            (w / 2, h - margin - ih / 2),  # 하단
+            (margin + ih / 2, h / 2),  # 좌측
+            (w - margin - ih / 2, h / 2),  # 우측
+        )
+        self.box_size = (box, box)
+        self.transforms = [
+            QTransform().translate(round(x), round(y)).rotate(degree)
+            for (x, y), degree in zip(centers, VIEW_ROTATIONS)
+        ]
+
+    def paintEvent(self, e):
+        if self.telemetry is None:
+            self.paint()
+        else:
+            with self.telemetry.timer("paint"):
+                self.paint()
+
+    def paint(self):
+        painter = QPainter(self)
+        if self.pixmap is not None:
+            # 정수 위치에 그려야 픽셀 보간 없이 복사된다
+            offset = QPoint(-(self.pixmap.width() // 2), -(self.pixmap.height() // 2))
+            for transform in self.transforms:
+                painter.setTransform(transform)
+                painter.drawPixmap(offset, self.pixmap)
+            if self.first_paint is None:
+                self.first_paint = time.monotonic()
+
+        if self.pip is not None:
+            painter.resetTransform()
+            painter.drawImage(self.width() - self.pip.width() - 8, self.height() - self.pip.height() - 8, self.pip)
+
+        if self.show_overlay and self.overlay_text:
+            painter.resetTransform()
+            painter.setPen(Qt.green)
+            painter.drawText(self.rect().adjusted(8, 8, -8, -8), Qt.AlignLeft | Qt.AlignTop, self.overlay_text)
+        painter.end()
+
+
 class ImageRotationUI(QWidget):
-    def __init__(self, image_path="./render/model_1"):
+    def __init__(self, image_path="./render/model_1", cache_max_bytes=frame_cache.DEFAULT_MAX_BYTES,
+                 loader_workers=2, prefetch_models=False, fullscreen=False,
+                 telemetry_log=None, show_overlay=False):
         super().__init__()
 
         self.setWindowTitle('Image Rotation UI')
@@ -22,33 +157,57 @@ class ImageRotationUI(QWidget):
         self.key_left = False
         self.key_right = False
 
-        # 이미지 경로 설정 (여러 개의 이미지 사용)
-        self.set_image(image_path)
+        # 이미지 크기 설정 (창 크기에 따라 바뀜)
+        self.max_size = (BASE_BOX, BASE_BOX)
 
-        # 이미지 크기 설정 (최대 100x100)
-        self.max_size = (450, 450)
-        
-        # 여백 설정
-        self.margin = 20
+        # 성능 계측 (오버레이와 JSON Lines 로그는 1초에 한 번 갱신)
+        self.telemetry = telemetry.Telemetry(telemetry_log)
 
-        # 이미지 라벨 초기화
-        self.top_image = QLabel(self)
-        self.bottom_image = QLabel(self)
-        self.left_image = QLabel(self)
-        self.right_image = QLabel(self)
+        # 네 방향 이미지를 그리는 위젯
+        self.canvas = HologramCanvas(self, on_resize=self.on_canvas_resize, telemetry=self.telemetry)
+        self.canvas.show_overlay = show_overlay
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.canvas)
 
-        # 타이머 설정
+        # 창 크기 조절이 끝난 뒤에 한 번만 새 크기로 다시 불러온다
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.timeout.connect(self.apply_canvas_size)
+
+        # 회전 및 크기 조정이 끝난 프레임 캐시와 백그라운드 로더
+        self.frame_cache = frame_cache.FrameCache(cache_max_bytes)
+        self.loader = model_loader.ModelLoader(
+            self.frame_cache, self.max_size, workers=loader_workers,
+            prefetch_models=RENDER_MODEL_PATHS if prefetch_models else ()
+        )
+
+        # 이미지 경로 설정 (여러 개의 이미지 사용)
+        # 첫 모델은 화면에 보여줄 첫 프레임만 기다리고 나머지는 창이 뜬 뒤에 불러온다
+        self.path = None
+        self.pending_path = None
+        self.loader.request(image_path)
+        self.loader.wait_ready(image_path, count=1)
+        self.switch_model(image_path)
+
+        # 타이머 설정 (바뀐 것이 있을 때만 다시 그리고, 상태에 따라 간격을 바꾼다)
+        self.last_change = time.monotonic()
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_images)
-        self.timer.start(100)  # 100ms = 0.1초
+        self.timer.start(TICK_NORMAL_MS)
 
-        self.show()
+        if fullscreen:
+            self.showFullScreen()
+        else:
+            self.show()
         
     def keyPressEvent(self, e):
         if e.key() == Qt.Key.Key_Left:
             self.key_left = True
         if e.key() == Qt.Key.Key_Right:
             self.key_right = True
+        if self.is_active():
+            self.update_tick_rate(time.monotonic())
 
         if e.key() == Qt.Key.Key_1:
             self.set_image(RENDER_MODEL_PATHS[0])
@@ -57,6 +216,17 @@ class ImageRotationUI(QWidget):
         elif e.key() == Qt.Key.Key_3:
             self.set_image(RENDER_MODEL_PATHS[2])
 
+        if e.key() == Qt.Key.Key_D:
+            # 성능 오버레이 켜기/끄기
+            self.canvas.show_overlay = not self.canvas.show_overlay
+            self.canvas.update()
+
+        if e.key() == Qt.Key.Key_F11:
+            if self.isFullScreen():
+                self.showNormal()
+            else:
+                self.showFullScreen()
+
     def keyReleaseEvent(self,e):
         if e.key() == Qt.Key.Key_Left:
             self.key_left = False
@@ -64,15 +234,53 @@ class ImageRotationUI(QWidget):
             self.key_right = False
     
     def set_image(self, image_path):
+        # 목록 읽기와 디코딩은 백그라운드에서 진행하고, 준비되면 update_images에서 교체한다
+        if self.pending_path is not None and self.pending_path != image_path:
+            self.loader.forget(self.pending_path)
+        if image_path == self.path:
+            self.pending_path = None
+            return
+
+        self.pending_path = image_path
+        self.loader.request(image_path)
+
+    def switch_model(self, image_path):
+        # 프레임 수는 모델마다 다를 수 있다 (한 바퀴 = frame_count장)
+        manifest = self.loader.manifest(image_path)
+
         self.path = image_path
-        self.image_paths = [os.path.join(self.path, i) for i in os.listdir(self.path)]
-        self.max_image_index = len(self.image_paths)  # 90개의 이미지를 사용할 예정
-        if self.max_image_index != 90:
-            raise ValueError("the number of images is not 90.")
-        
+        self.manifest = manifest
+        self.max_image_index = manifest.frame_count
         self.current_image_index = 0
+        self.frames = self.loader.frames(self.path)
+
+        pixmap = self.frames[0]
+        self.canvas.set_frame_size(pixmap.width(), pixmap.height())
+        self.canvas.set_pixmap(pixmap)
+        self.canvas.set_box_levels(manifest.lod_sizes)
         print("model path:", self.path)
-    
+
+    def on_canvas_resize(self, box_size):
+        if box_size != self.max_size:
+            self.resize_timer.start(200)
+
+    def apply_canvas_size(self):
+        # 새 크기의 프레임이 준비될 때까지는 이전 크기의 이미지를 그대로 그린다
+        self.max_size = self.canvas.box_size
+        self.loader.set_max_size(self.max_size)
+        self.frames = self.loader.frames(self.path)
+
+    def poll_pending_model(self):
+        try:
+            if not self.loader.is_ready(self.pending_path):
+                return
+            self.switch_model(self.pending_path)
+        except Exception as e:
+            # 없는 폴더(OSError)나 잘린 아카이브(struct.error)도 타이머 안에서 앱을 멈추지 않게 한다
+            print("cannot load model:", e)
+            self.loader.forget(self.pending_path)
+        self.pending_path = None
+
     ##############################################################################
     def get_next_index(self) -> int:
         if self.key_left and not self.key_right:
@@ -84,39 +292,62 @@ class ImageRotationUI(QWidget):
     
     ##############################################################################
 
+    def is_active(self) -> bool:
+        """조작 중이면 True (틱 간격을 TICK_ACTIVE_MS로 줄인다)"""
+        return self.key_left != self.key_right
+
+    def tick_interval(self, now) -> int:
+        if self.is_active():
+            return TICK_ACTIVE_MS
+        # 불러오는 중인 프레임이나 모델이 있으면 보통 간격을 유지한다
+        if now - self.last_change < IDLE_AFTER or self.pending_path is not None or self.loader.jobs:
+            return TICK_NORMAL_MS
+        return TICK_IDLE_MS
+
+    def update_tick_rate(self, now):
+        interval = self.tick_interval(now)
+        if interval != self.timer.interval():
+            self.timer.setInterval(interval)
+            self.telemetry.set("tick_ms", interval)
+
     def update_images(self):
+        with self.telemetry.timer("tick"):
+            presented = self.step_images()
+
+        now = time.monotonic()
+        if presented:
+            self.last_change = now
+            self.telemetry.count("presented")
+        else:
+            self.telemetry.count("redraw_skipped")
+        self.update_tick_rate(now)
+
+        if self.telemetry.tick():
+            self.canvas.set_overlay_text(self.telemetry.overlay)
+
+    def step_images(self) -> bool:
+        """새 프레임을 화면에 넘겼으면 True. 인덱스나 모델이 그대로면 다시 그리지 않는다."""
+        # 완료된 프레임을 캐시에 넣고, 기다리던 모델이 준비됐으면 교체
+        self.loader.poll(self.path, self.current_image_index)
+        if self.pending_path is not None:
+            self.poll_pending_model()
+
         # 다음 이미지로 인덱스 증가
         self.current_image_index = self.get_next_index()
         
-        # 이미지 로드
-        current_image_path = self.image_paths[self.current_image_index]
-        original_pixmap = QPixmap(current_image_path)
-
-        # 이미지를 중앙을 향하도록 회전 및 크기 조정 후 배치
-
-        # 상단 이미지
-        top_pixmap = original_pixmap.transformed(QTransform().rotate(180))
-        top_pixmap = top_pixmap.scaled(self.max_size[0], self.max_size[1], Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.top_image.setPixmap(top_pixmap)
-        self.top_image.setGeometry((800 - top_pixmap.width()) // 2, self.margin, top_pixmap.width(), top_pixmap.height())
-
-        # 하단 이미지
-        bottom_pixmap = original_pixmap.transformed(QTransform().rotate(0))
-        bottom_pixmap = bottom_pixmap.scaled(self.max_size[0], self.max_size[1], Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.bottom_image.setPixmap(bottom_pixmap)
-        self.bottom_image.setGeometry((800 - bottom_pixmap.width()) // 2, 600 - bottom_pixmap.height() - self.margin, bottom_pixmap.width(), bottom_pixmap.height())
-
-        # 좌측 이미지
-        left_pixmap = original_pixmap.transformed(QTransform().rotate(90))
-        left_pixmap = left_pixmap.scaled(self.max_size[0], self.max_size[1], Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.left_image.setPixmap(left_pixmap)
-        self.left_image.setGeometry(self.margin, (600 - left_pixmap.height()) // 2, left_pixmap.width(), left_pixmap.height())
-
-        # 우측 이미지
-        right_pixmap = original_pixmap.transformed(QTransform().rotate(-90))
-        right_pixmap = right_pixmap.scaled(self.max_size[0], self.max_size[1], Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.right_image.setPixmap(right_pixmap)
-        self.right_image.setGeometry(800 - right_pixmap.width() - self.margin, (600 - right_pixmap.height()) // 2, right_pixmap.width(), right_pixmap.height())
+        # 캐시에서 미리 크기 조정된 이미지를 가져와 교체만 한다
+        pixmap = self.frames[self.current_image_index]
+        if pixmap is None or pixmap is self.canvas.pixmap:
+            # 아직 로드 중인 프레임이거나 이미 보여주고 있는 프레임이면 이전 이미지를 유지
+            return False
+        self.canvas.set_pixmap(pixmap)
+        return True
+
+    def closeEvent(self, e):
+        self.timer.stop()
+        self.loader.shutdown()
+        self.telemetry.close()
+        super().closeEvent(e)
 
 if __name__ == "__main__":
     app = QApplication([])
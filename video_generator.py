@@ -1,94 +1,365 @@
-import bpy
+"""모델 주위를 도는 카메라로 frames장의 PNG를 렌더링한다
+
+Blender 안에서 실행하면(blender -b --python video_generator.py) 모든 프레임을 차례로 렌더링하고,
+일반 python으로 실행하면 프레임을 여러 개의 headless Blender 작업자에게 나눠 렌더링한 뒤
+bake.py로 밝기 보정과 화면 크기별 아카이브 생성을 한다. (Blender 안에서는 bake.py를 따로 실행)
+
+프레임마다 .blend 파일과 렌더링 설정의 해시를 출력 폴더의 render_manifest.json에 기록해 두고,
+입력이 바뀌지 않은 프레임은 다시 렌더링하지 않는다. 더 이상 쓰지 않는 프레임은 지운다.
+
+    python video_generator.py --workers 8 --blender /path/to/blender
+    python video_generator.py --blend ./blend/tree.blend --output ./render/model_4
+"""
+import argparse
+import hashlib
+import json
 import math
 import os
-from PIL import Image, ImageEnhance
+import re
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
 
 
 blend_file_path = "./blend/christmas.blend"
-output_path = r".\render\model_3\frame_"
-output_path_abs = os.path.abspath(output_path)
+output_dir = os.path.join(".", "render", "model_3")
 zoom_level = 20
 rotation_radius = 30
 resolution = (800, 480)
 frames = 90
+render_engine = 'BLENDER_WORKBENCH'
+
+# 장면 구성 코드(setup_scene)를 바꿨으면 올려서 모든 프레임을 다시 렌더링한다
+RENDER_VERSION = 2
+MANIFEST_NAME = "render_manifest.json"
+FRAME_FILE = re.compile(r"^frame_(\d+)\.png$")
+
+
+def frame_path(output_dir, frame):
+    return os.path.join(os.path.abspath(output_dir), f"frame_{frame:04d}.png")
+
+
+##############################################################################
+# 렌더링 매니페스트: 프레임마다 입력(.blend 내용 + 설정 + 프레임 번호)의 해시를 기록한다
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def render_params():
+    return {
+        "version": RENDER_VERSION,
+        "zoom_level": zoom_level,
+        "rotation_radius": rotation_radius,
+        "resolution": list(resolution),
+        "frames": frames,
+        "engine": render_engine,
+    }
+
+
+def frame_hashes(blend_digest):
+    base = json.dumps({"blend": blend_digest, **render_params()}, sort_keys=True)
+    return {frame: hashlib.sha256(f"{base}|{frame}".encode()).hexdigest() for frame in range(1, frames + 1)}
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            return {int(k): v for k, v in json.load(f)["frames"].items()}
+    except (OSError, ValueError, KeyError):
+        return {}
+
 
+def save_manifest(output_dir, done):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        # PNG는 밝기 보정 없이 저장한다 (bake.py와 model_manifest가 이 값을 보고 보정한다)
+        json.dump({"params": render_params(), "brightened": False,
+                   "frames": {f"{k:04d}": v for k, v in sorted(done.items())}}, f, indent=1)
+    os.replace(path + ".tmp", path)
 
-# Load the .blend file
-bpy.ops.wm.open_mainfile(filepath=blend_file_path)
 
-# Define the target object (assumes there's at least one object in the scene)
-target_object = bpy.data.objects[0]
+def level_archives(output_dir) -> dict:
+    """bake.py가 만든 크기별 아카이브 {box_size: path}
 
-# Add a camera if there is no camera in the scene
-if not bpy.data.cameras:
-    bpy.ops.object.camera_add()
-    camera = bpy.context.object
-else:
-    camera = bpy.data.objects[0]
-    if camera.type != 'CAMERA':
+    Blender 안에서도 부르므로 PyQt5를 쓰는 frame_archive.find_lods 대신 이름만 맞춰 본다."""
+    directory, name = os.path.split(os.path.normpath(output_dir))
+    pattern = re.compile(re.escape(name) + r"\.(\d+)\.hfa$")
+    levels = {}
+    for entry in os.listdir(directory or "."):
+        match = pattern.match(entry)
+        if match is not None:
+            levels[int(match.group(1))] = os.path.join(directory, entry)
+    return levels
+
+
+def needs_bake(output_dir, sizes) -> bool:
+    """원래 크기(model_N.hfa)와 크기별 아카이브가 하나라도 없거나 가장 최근 프레임보다 오래됐으면 True"""
+    levels = level_archives(output_dir)
+    if any(size not in levels for size in sizes):
+        return True
+    levels[None] = os.path.normpath(output_dir) + ".hfa"
+    if not os.path.exists(levels[None]):
+        return True
+    newest = max((os.path.getmtime(frame_path(output_dir, frame)) for frame in range(1, frames + 1)
+                  if os.path.exists(frame_path(output_dir, frame))), default=0.0)
+    return any(os.path.getmtime(path) < newest for path in levels.values())
+
+
+def plan_frames(blend_path, output_dir, force=False):
+    """(다시 렌더링할 프레임 목록, 프레임별 해시, 지금 유효한 프레임의 해시)를 돌려준다
+
+    목록에 없는 프레임 파일(frames가 줄어든 경우)과 오래된 .hfa 아카이브(크기별 포함)는 여기서 지운다.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    hashes = frame_hashes(file_digest(blend_path))
+    previous = {} if force else load_manifest(output_dir)
+
+    done = {}
+    for frame, digest in hashes.items():
+        if previous.get(frame) == digest and os.path.exists(frame_path(output_dir, frame)):
+            done[frame] = digest
+    todo = [frame for frame in hashes if frame not in done]
+
+    removed = 0
+    for name in os.listdir(output_dir):
+        match = FRAME_FILE.match(name)
+        if match is not None and int(match.group(1)) not in hashes:
+            os.remove(os.path.join(output_dir, name))
+            removed += 1
+
+    # 프레임이 하나라도 바뀌면 frame_archive와 bake.py로 만든 아카이브는 더 이상 맞지 않는다
+    # (남겨 두면 다시 렌더링하다 실패했을 때 UI가 예전 프레임이나 다른 프레임 수의 아카이브를 읽는다)
+    if todo or removed:
+        archive = os.path.normpath(output_dir) + ".hfa"
+        for path in [archive, *level_archives(output_dir).values()]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    save_manifest(output_dir, done)
+    return todo, hashes, done
+
+
+##############################################################################
+
+def setup_scene(blend_path):
+    # Load the .blend file
+    bpy.ops.wm.open_mainfile(filepath=blend_path)
+
+    # Define the target object (assumes there's at least one object in the scene)
+    target_object = bpy.data.objects[0]
+
+    # Add a camera if there is no camera in the scene
+    if not bpy.data.cameras:
         bpy.ops.object.camera_add()
         camera = bpy.context.object
+    else:
+        camera = bpy.data.objects[0]
+        if camera.type != 'CAMERA':
+            bpy.ops.object.camera_add()
+            camera = bpy.context.object
+
+    # Set up camera settings
+    camera.location = (0, -10, 5)
+    camera.rotation_euler = (math.radians(90), 0, 0)
+    bpy.context.scene.camera = camera
+
+    # Set the camera lens (zoom level)
+    camera.data.lens = zoom_level
+
+    # Add an empty to act as the target for the camera to look at
+    bpy.ops.object.empty_add(location=target_object.location)
+    target_empty = bpy.context.object
+    target_empty.name = "CameraTarget"
+
+    # Add a Track To constraint to the camera
+    track_constraint = camera.constraints.new(type='TRACK_TO')
+    track_constraint.target = target_empty
+    track_constraint.track_axis = 'TRACK_NEGATIVE_Z'
+    track_constraint.up_axis = 'UP_Y'
+
+    # Set up animation for camera rotation
+    bpy.context.scene.frame_start = 1
+    bpy.context.scene.frame_end = frames
+    bpy.context.scene.render.fps = 24
+
+    # Create keyframes for camera rotation
+    for frame in range(1, frames + 1):
+        angle = 2 * math.pi * (frame / frames)
+        camera.location.x = rotation_radius * math.cos(angle)
+        camera.location.y = rotation_radius * math.sin(angle)
+        camera.location.z = 0
+        camera.keyframe_insert(data_path="location", frame=frame)
+
+    # Set the background color to black
+    bpy.data.worlds["World"].node_tree.nodes["Background"].inputs[0].default_value = (0, 0, 0, 1)  # (R, G, B, Alpha)
+
+    # Set render settings for PNG sequence
+    bpy.context.scene.render.resolution_x = resolution[0]
+    bpy.context.scene.render.resolution_y = resolution[1]
+    bpy.context.scene.render.fps = 24
+    bpy.context.scene.render.image_settings.file_format = 'PNG'
+    bpy.context.scene.render.image_settings.color_mode = 'RGBA'  # To include transparency if needed
+    bpy.context.scene.render.engine = render_engine
+    bpy.context.scene.render.film_transparent = True
+
+
+def render_frames(output_dir, frame_list, on_done=None):
+    # Render the animation frame by frame
+    for frame in frame_list:
+        start = time.perf_counter()
+        bpy.context.scene.frame_set(frame)
+        abs_path = frame_path(output_dir, frame)
+        bpy.context.scene.render.filepath = abs_path
+        bpy.ops.render.render(write_still=True)
+        # 병렬 실행 시 부모 프로세스가 이 줄로 진행 상황을 받는다
+        print(f"FRAME_DONE {frame} {time.perf_counter() - start:.3f}", flush=True)
+        if on_done is not None:
+            on_done(frame)
+
+
+##############################################################################
+# Blender 안에서 실행되는 부분
+
+def blender_main(argv):
+    parser = argparse.ArgumentParser(prog="video_generator.py (blender)")
+    parser.add_argument("--blend", default=blend_file_path)
+    parser.add_argument("--output", default=output_dir)
+    parser.add_argument("--frames", help="comma separated frame numbers (작업자 모드, 매니페스트는 부모가 관리)")
+    args = parser.parse_args(argv)
+
+    if args.frames is not None:
+        setup_scene(args.blend)
+        render_frames(args.output, [int(i) for i in args.frames.split(",")])
+        return
+
+    # 단독 실행: 바뀐 프레임만 차례로 렌더링하고 매니페스트를 갱신한다
+    todo, hashes, done = plan_frames(args.blend, args.output)
+    print(f"{len(todo)} of {frames} frames to render")
+    if not todo:
+        return
+
+    def on_done(frame):
+        done[frame] = hashes[frame]
+        save_manifest(args.output, done)
+
+    setup_scene(args.blend)
+    render_frames(args.output, todo, on_done)
+    print(f"done. run: python bake.py {args.output}")
+
+
+##############################################################################
+# 일반 python에서 실행되는 부분: Blender 작업자 여러 개를 동시에 돌린다
+
+class Progress:
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+
+    def report(self, frame, render_s):
+        with self.lock:
+            self.done += 1
+            elapsed = time.perf_counter() - self.start
+            print(f"[{self.done:>{len(str(self.total))}}/{self.total}] frame {frame:04d} "
+                  f"render {render_s:.2f}s (elapsed {elapsed:.1f}s)", flush=True)
+
+
+def read_worker(process, progress, on_done, errors):
+    for line in process.stdout:
+        if not line.startswith("FRAME_DONE"):
+            continue
+        _, frame, render_s = line.split()
+        progress.report(int(frame), float(render_s))
+        on_done(int(frame))
+    process.wait()
+    if process.returncode != 0:
+        errors.append(f"blender worker {process.args} exited with {process.returncode}")
+
+
+def parallel_main(argv):
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="render model frames with several headless Blender processes")
+    parser.add_argument("--blender", default="blender", help="Blender executable")
+    parser.add_argument("--blend", default=blend_file_path, help=".blend file to render")
+    parser.add_argument("--output", default=output_dir, help="output folder (render/model_N)")
+    parser.add_argument("--force", action="store_true", help="ignore the render manifest and render every frame")
+    parser.add_argument("--workers", type=int, default=max(1, cpu_count // 4), help="number of Blender processes")
+    parser.add_argument("--threads", type=int, default=0, help="render threads per Blender process (0: auto)")
+    parser.add_argument("--no-bake", action="store_true", help="skip bake.py (brightness and size levels)")
+    args = parser.parse_args(argv)
+
+    todo, hashes, done = plan_frames(args.blend, args.output, force=args.force)
+    print(f"{len(todo)} of {frames} frames to render ({len(done)} unchanged)", flush=True)
+    if todo:
+        status = render_parallel(args, todo, hashes, done)
+        if status != 0:
+            return status
+
+    # 렌더링할 프레임이 없어도 이전 굽기가 중간에 멈췄거나 --no-bake로 건너뛰었으면 지금 굽는다
+    if not args.no_bake:
+        import bake
+        if todo or needs_bake(args.output, bake.LOD_SIZES):
+            start = time.perf_counter()
+            bake.bake_model(args.output)
+            print(f"baked {args.output} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def render_parallel(args, todo, hashes, done):
+    """todo 프레임을 Blender 작업자 여러 개로 나눠 렌더링한다. 하나라도 실패하면 1"""
+    cpu_count = os.cpu_count() or 1
+    workers = min(args.workers, len(todo))
+    threads = args.threads or max(1, cpu_count // workers)
+    script = os.path.abspath(__file__)
+
+    manifest_lock = threading.Lock()
+
+    def on_done(frame):
+        # 끝난 프레임부터 매니페스트에 기록한다 (중간에 멈춰도 다음 실행에서 이어감)
+        with manifest_lock:
+            done[frame] = hashes[frame]
+            save_manifest(args.output, done)
+
+    progress = Progress(len(todo))
+    errors = []
+    readers = []
+    # 프레임을 번갈아 나눠서 작업자 간 부하를 맞춘다
+    for i in range(workers):
+        frame_list = ",".join(str(frame) for frame in todo[i::workers])
+        cmd = [args.blender, "-b", "-t", str(threads), "--python", script, "--",
+               "--blend", args.blend, "--output", args.output, "--frames", frame_list]
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True, bufsize=1)
+        reader = threading.Thread(target=read_worker, args=(process, progress, on_done, errors), daemon=True)
+        reader.start()
+        readers.append(reader)
+
+    for reader in readers:
+        reader.join()
+
+    elapsed = time.perf_counter() - progress.start
+    print(f"{progress.done}/{len(todo)} frames in {elapsed:.1f}s ({progress.done / elapsed:.2f} frames/s)")
+    for error in errors:
+        print("error:", error, file=sys.stderr)
+    if errors or progress.done != len(todo):
+        return 1
+    return 0
+
 
-# Set up camera settings
-camera.location = (0, -10, 5)
-camera.rotation_euler = (math.radians(90), 0, 0)
-bpy.context.scene.camera = camera
-
-# Set the camera lens (zoom level)
-camera.data.lens = zoom_level
-
-# Add an empty to act as the target for the camera to look at
-bpy.ops.object.empty_add(location=target_object.location)
-target_empty = bpy.context.object
-target_empty.name = "CameraTarget"
-
-# Add a Track To constraint to the camera
-track_constraint = camera.constraints.new(type='TRACK_TO')
-track_constraint.target = target_empty
-track_constraint.track_axis = 'TRACK_NEGATIVE_Z'
-track_constraint.up_axis = 'UP_Y'
-
-# Set up animation for camera rotation
-bpy.context.scene.frame_start = 1
-bpy.context.scene.frame_end = frames
-bpy.context.scene.render.fps = 24
-
-# Create keyframes for camera rotation
-for frame in range(1, frames + 1):
-    angle = 2 * math.pi * (frame / frames)
-    camera.location.x = rotation_radius * math.cos(angle)
-    camera.location.y = rotation_radius * math.sin(angle)
-    camera.location.z = 0
-    camera.keyframe_insert(data_path="location", frame=frame)
-
-# Set the background color to black
-bpy.data.worlds["World"].node_tree.nodes["Background"].inputs[0].default_value = (0, 0, 0, 1)  # (R, G, B, Alpha)
-
-# Set render settings for PNG sequence
-bpy.context.scene.render.resolution_x = resolution[0]
-bpy.context.scene.render.resolution_y = resolution[1]
-bpy.context.scene.render.fps = 24
-bpy.context.scene.render.filepath = output_path_abs
-bpy.context.scene.render.image_settings.file_format = 'PNG'
-bpy.context.scene.render.image_settings.color_mode = 'RGBA'  # To include transparency if needed
-bpy.context.scene.render.engine = 'BLENDER_WORKBENCH'
-bpy.context.scene.render.film_transparent = True
-
-def increase_brightness(image_path, brightness_factor):
-    # 이미지 열기
-    image = Image.open(image_path)
-    
-    # 밝기 조절
-    enhancer = ImageEnhance.Brightness(image)
-    brightened_image = enhancer.enhance(brightness_factor)
-    
-    # 밝기 조절된 이미지 저장 (원본 파일 덮어쓰기)
-    brightened_image.save(image_path)
-    
-# Render the animation frame by frame
-for frame in range(1, frames + 1):
-    bpy.context.scene.frame_set(frame)
-    abs_path = output_path_abs + f"{frame:04d}.png"
-    bpy.context.scene.render.filepath = abs_path
-    bpy.ops.render.render(write_still=True)
-    increase_brightness(abs_path, 1.5)
\ No newline at end of file
+if __name__ == "__main__":
+    if bpy is not None:
+        # Blender 인자 중 "--" 뒤만 이 스크립트의 인자
+        blender_main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [])
+    else:
+        sys.exit(parallel_main(sys.argv[1:]))